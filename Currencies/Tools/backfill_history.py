@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from currency import Currency  # noqa: E402
+
+
+async def backfill(base, targets, start_date, end_date, batch_size):
+    currency = Currency()
+    if currency.archive is None:
+        print("Warning: HISTORY_ARCHIVE=false, days are stored in Redis instead")
+
+    fetched = 0
+    failed = []
+    try:
+        async for date_str, count in currency.backfill_history(
+            base,
+            start_date,
+            end_date,
+            targets=targets,
+            batch_size=batch_size,
+            failed=failed,
+        ):
+            fetched += 1
+            print(f"{date_str}: {count} rates")
+    finally:
+        await currency.client.aclose()
+
+    print(
+        f"Done! Fetched {fetched} days for {base} between {start_date} and {end_date}."
+    )
+    if failed:
+        print(
+            f"Warning: {len(failed)} days failed ({', '.join(sorted(failed))}); "
+            "run again to retry them"
+        )
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fill the historical rate archive from currencyapi, skipping days already stored"
+    )
+    parser.add_argument("--base", default="USD")
+    parser.add_argument(
+        "--targets", help="comma-separated symbols (default: every known currency)"
+    )
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=date.today() - timedelta(days=365),
+        help="YYYY-MM-DD (default: one year ago)",
+    )
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        default=date.today() - timedelta(days=1),
+        help="YYYY-MM-DD (default: yesterday)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=30, help="days fetched concurrently"
+    )
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",")] if args.targets else None
+    ok = asyncio.run(
+        backfill(args.base, targets, args.start, args.end, args.batch_size)
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,104 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CURRENCIES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Keep in sync with currencies.REGISTRY_DTYPE / TYPE_CODES.
+REGISTRY_DTYPE = np.dtype(
+    [
+        ("symbol", "S12"),
+        ("type", "u1"),
+        ("decimals", "i1"),
+        ("provider_id", "S16"),
+    ]
+)
+TYPE_CODES = {"FIAT": 1, "CRYPTO": 2}
+REGISTRY_HEADER = b"#LISTS"
+
+
+def lists_digest(fiat_file, crypto_file):
+    """Same as currencies.lists_digest; workers compare it to the lists."""
+    digest = hashlib.blake2b(digest_size=8)
+    for file_path in (fiat_file, crypto_file):
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest().encode()
+
+
+def read_symbols(file_path):
+    if not os.path.exists(file_path):
+        return set()
+    with open(file_path, "r", encoding="utf-8") as f:
+        return {line.strip().upper() for line in f if line.strip()}
+
+
+def read_metadata(file_path):
+    """
+    Per-symbol metadata from a currencyapi /currencies dump, either the raw
+    response ({"data": {...}}) or the bare mapping used by
+    process_valid_currencies.py.
+    """
+    if not file_path or not os.path.exists(file_path):
+        return {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data = data.get("data", data)
+    return {code.upper(): info for code, info in data.items()}
+
+
+def build_registry(fiat_file, crypto_file, metadata_file, output_file):
+    fiat = read_symbols(fiat_file)
+    crypto = read_symbols(crypto_file)
+    metadata = read_metadata(metadata_file)
+
+    # Fiat wins when a symbol is listed as both.
+    types = {iso: "CRYPTO" for iso in crypto}
+    types.update({iso: "FIAT" for iso in fiat})
+
+    symbols = sorted(types)
+    records = np.zeros(len(symbols) + 1, dtype=REGISTRY_DTYPE)
+    records[0] = (REGISTRY_HEADER, 0, 0, lists_digest(fiat_file, crypto_file))
+    for i, iso in enumerate(symbols, start=1):
+        info = metadata.get(iso, {})
+        records[i] = (
+            iso.encode(),
+            TYPE_CODES[types[iso]],
+            info.get("decimal_digits", -1),
+            str(info.get("code", iso)).encode(),
+        )
+
+    # Write next to the target and rename, so workers that already have the
+    # old file mapped keep a consistent view.
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp_file, output_file)
+
+    print(
+        f"Done! Wrote {len(symbols)} symbols ({len(fiat)} fiat, {len(crypto)} crypto) to {output_file}."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile fiat.txt and crypto.txt into registry.npy"
+    )
+    parser.add_argument("--fiat", default=os.path.join(CURRENCIES_DIR, "fiat.txt"))
+    parser.add_argument("--crypto", default=os.path.join(CURRENCIES_DIR, "crypto.txt"))
+    parser.add_argument(
+        "--metadata",
+        default=os.path.join(CURRENCIES_DIR, "currencies.json"),
+        help="optional currencyapi /currencies dump for decimals and provider ids",
+    )
+    parser.add_argument(
+        "--output", default=os.path.join(CURRENCIES_DIR, "registry.npy")
+    )
+    args = parser.parse_args()
+
+    build_registry(args.fiat, args.crypto, args.metadata, args.output)
@@ -0,0 +1,74 @@
+import numpy as np
+
+AGGREGATIONS = ("ohlc", "mean", "minmax")
+
+
+def bucket_aggregate(values: np.ndarray, bucket_size: int) -> dict:
+    """
+    Aggregate a daily series into consecutive buckets of bucket_size days.
+
+    values holds one float per day, NaN where the day is missing. Returns
+    arrays with one entry per bucket: open/close (first and last present
+    day), high/low, mean and count. Buckets with no data have count 0 and
+    NaN everywhere else.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_buckets = -(-len(values) // bucket_size)
+    padded = np.full(num_buckets * bucket_size, np.nan)
+    padded[: len(values)] = values
+    grid = padded.reshape(num_buckets, bucket_size)
+
+    present = ~np.isnan(grid)
+    count = present.sum(axis=1)
+    rows = np.arange(num_buckets)
+    first = present.argmax(axis=1)
+    last = bucket_size - 1 - present[:, ::-1].argmax(axis=1)
+
+    # fmax/fmin skip NaN without the all-NaN warnings of nanmax/nanmin.
+    high = np.fmax.reduce(grid, axis=1)
+    low = np.fmin.reduce(grid, axis=1)
+    mean = np.divide(
+        np.where(present, grid, 0).sum(axis=1),
+        count,
+        out=np.full(num_buckets, np.nan),
+        where=count > 0,
+    )
+
+    return {
+        "open": np.where(count > 0, grid[rows, first], np.nan),
+        "high": high,
+        "low": low,
+        "close": np.where(count > 0, grid[rows, last], np.nan),
+        "mean": mean,
+        "count": count,
+    }
+
+
+def bucket_points(buckets: dict, how: str) -> list[dict]:
+    """
+    Per-bucket JSON points for one aggregation. Every point carries a value
+    (close or mean) so it charts like a plain series; ohlc and minmax add
+    the low/high range.
+    """
+    if how == "ohlc":
+        fields = {
+            "open": buckets["open"],
+            "high": buckets["high"],
+            "low": buckets["low"],
+            "close": buckets["close"],
+            "value": buckets["close"],
+        }
+    elif how == "minmax":
+        fields = {
+            "low": buckets["low"],
+            "high": buckets["high"],
+            "value": buckets["mean"],
+        }
+    elif how == "mean":
+        fields = {"value": buckets["mean"]}
+    else:
+        raise ValueError(f"Unknown aggregation: {how}")
+
+    names = list(fields)
+    columns = np.column_stack([fields[n] for n in names]).tolist()
+    return [dict(zip(names, row)) for row in columns]
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HISTORY_ARCHIVE_DIR = os.getenv(
+    "HISTORY_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "History"),
+)
+
+VALUE_BYTES = 8
+
+
+class HistoryArchive:
+    """
+    Append-only on-disk store of daily historical rates.
+
+    One column file per (base, target) under root/base/target.f64 holds a
+    little-endian float64 per day, at offset day_number * 8 (days since
+    1970-01-01, as in the Redis series). Unwritten days are holes that read
+    back as zero and so as missing (rates are never 0). Files are sparse and
+    read through read-only memory maps; past rates never change, so a value
+    is written once and any worker on the host can read it.
+    """
+
+    def __init__(self, root: str = HISTORY_ARCHIVE_DIR) -> None:
+        self.root = root
+
+    def _path(self, base: str, target: str) -> str | None:
+        # Symbols come from request paths; anything but a plain code never
+        # reaches the filesystem.
+        if not (base.isalnum() and target.isalnum()):
+            return None
+        return os.path.join(self.root, base, f"{target}.f64")
+
+    def read(self, base: str, targets: list[str], days: np.ndarray) -> dict:
+        """{target: float64 array aligned with days, NaN where not archived}."""
+        result = {}
+        for target in targets:
+            values = np.full(len(days), np.nan)
+            path = self._path(base, target)
+            if path and len(days) and os.path.exists(path):
+                try:
+                    column = np.memmap(path, dtype="<f8", mode="r")
+                except ValueError:
+                    # Empty file: nothing archived yet.
+                    column = np.empty(0, dtype="<f8")
+                in_range = (days >= 0) & (days < len(column))
+                picked = column[days[in_range]]
+                values[in_range] = np.where(picked == 0, np.nan, picked)
+            result[target] = values
+        return result
+
+    def write(self, base: str, day: int, values: dict) -> None:
+        """Store {target: value} for one day."""
+        for target, value in values.items():
+            path = self._path(base, target)
+            if path is None or not value:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                os.pwrite(
+                    fd, np.float64(value).astype("<f8").tobytes(), day * VALUE_BYTES
+                )
+            finally:
+                os.close(fd)
@@ -0,0 +1,599 @@
+import asyncio
+import math
+import os
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, List, cast
+
+import numpy as np
+import redis
+import redis.asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Time series are stored one string per key: an 8-byte ASCII header holding
+# the day number of the first slot, then one little-endian float64 per day.
+# Gaps are zero-filled and read back as missing (rates are never 0).
+SERIES_HEADER_BYTES = 8
+
+RATE_LIMIT_ALGORITHMS = ("fixed_window", "sliding_window", "token_bucket")
+
+
+class CacheBackend(ABC):
+    """
+    Storage primitives the caches in cache.py are built on.
+
+    Values are strings (JSON-encoded by the caller). Backends connect lazily,
+    so constructing one never touches the network. Async methods are safe to
+    call from any event loop.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, expire_seconds: int | None = None) -> None: ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1) -> int: ...
+
+    @abstractmethod
+    def expire(self, key: str, seconds: int) -> None: ...
+
+    @abstractmethod
+    def mget(self, keys: list) -> list: ...
+
+    @abstractmethod
+    def set_many(self, items: dict, expire_seconds: int | None = None) -> None: ...
+
+    @abstractmethod
+    def rate_limit(
+        self,
+        algorithm: str,
+        rate_key: str,
+        blocked_key: str,
+        max_requests: int,
+        window_ms: int,
+        block_seconds: int,
+        cost: int,
+    ) -> tuple[int, int, int]:
+        """
+        Record cost requests and decide, atomically.
+
+        Returns (allowed, count, block_ttl_seconds); count is -1 when the IP
+        was already blocked.
+        """
+
+    @abstractmethod
+    async def hgetall_async(self, key: str) -> dict: ...
+
+    @abstractmethod
+    async def hmget_async(self, key: str, fields: list) -> list: ...
+
+    @abstractmethod
+    async def replace_hash_async(
+        self, key: str, mapping: dict, expire_seconds: int | None = None
+    ) -> None:
+        """Atomically replace the hash at key and give it a single TTL."""
+
+    @abstractmethod
+    async def read_series_async(
+        self, keys: list, first_day: int, last_day: int
+    ) -> list[tuple[int, bytes]]:
+        """(first day returned, raw little-endian float64 bytes) per key."""
+
+    @abstractmethod
+    async def write_series_async(self, key: str, points: dict) -> None:
+        """Merge {day_number: value} points, growing the series either way."""
+
+    @abstractmethod
+    async def exists_async(self, key: str) -> bool: ...
+
+    @abstractmethod
+    async def acquire_lock_async(self, name: str, timeout: float) -> str | None:
+        """Take the lock without blocking; returns a release token or None."""
+
+    @abstractmethod
+    async def release_lock_async(self, name: str, token: str) -> None: ...
+
+
+# Each limiter runs as one Lua script: the block check, the counter update,
+# its expiry and any new block happen atomically in a single round trip.
+# KEYS[1] is the counter, KEYS[2] the block key. ARGV is the request limit,
+# the window in milliseconds, the block duration in seconds and the number of
+# requests being recorded (more than one when flushing local counts). Scripts
+# return {allowed, count, block_ttl_seconds}; count is -1 when the IP was
+# already blocked.
+_RATE_LIMIT_BLOCK_CHECK_LUA = """
+local block_ttl = redis.call('TTL', KEYS[2])
+if block_ttl ~= -2 then
+    return {0, -1, block_ttl}
+end
+local max_requests = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local block_seconds = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+"""
+
+_RATE_LIMIT_DECIDE_LUA = """
+if count > max_requests then
+    redis.call('SET', KEYS[2], '1', 'EX', block_seconds)
+    return {0, count, block_seconds}
+end
+return {1, count, 0}
+"""
+
+RATE_LIMIT_SCRIPTS = {
+    # Counter that resets at the end of each window.
+    "fixed_window": _RATE_LIMIT_BLOCK_CHECK_LUA
+    + """
+local count = redis.call('INCRBY', KEYS[1], cost)
+if count == cost then
+    redis.call('PEXPIRE', KEYS[1], window_ms)
+end
+"""
+    + _RATE_LIMIT_DECIDE_LUA,
+    # Sorted-set log of request times over the trailing window.
+    "sliding_window": _RATE_LIMIT_BLOCK_CHECK_LUA
+    + """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms - window_ms)
+for i = 1, cost do
+    redis.call('ZADD', KEYS[1], now_ms, now[1] .. now[2] .. ':' .. i)
+end
+redis.call('PEXPIRE', KEYS[1], window_ms)
+local count = redis.call('ZCARD', KEYS[1])
+"""
+    + _RATE_LIMIT_DECIDE_LUA,
+    # Bucket of max_requests tokens refilled evenly over the window; count is
+    # the number of tokens in use after this request.
+    "token_bucket": _RATE_LIMIT_BLOCK_CHECK_LUA
+    + """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or max_requests
+local ts = tonumber(bucket[2]) or now_ms
+tokens = math.min(max_requests, tokens + (now_ms - ts) * max_requests / window_ms)
+tokens = tokens - cost
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now_ms)
+redis.call('PEXPIRE', KEYS[1], window_ms)
+local count = max_requests - math.floor(tokens)
+"""
+    + _RATE_LIMIT_DECIDE_LUA,
+}
+
+# Both series scripts run server-side so a read or a merge is one round trip.
+_READ_SERIES_LUA = """
+local header = redis.call('GETRANGE', KEYS[1], 0, 7)
+if header == '' then
+    return {tonumber(ARGV[1]), ''}
+end
+local start = tonumber(header)
+local first = math.max(tonumber(ARGV[1]), start)
+local last = tonumber(ARGV[2])
+if last < first then
+    return {first, ''}
+end
+return {first, redis.call('GETRANGE', KEYS[1], 8 + (first - start) * 8, 8 + (last - start + 1) * 8 - 1)}
+"""
+
+_WRITE_SERIES_LUA = """
+local new_start = tonumber(ARGV[1])
+local header = redis.call('GETRANGE', KEYS[1], 0, 7)
+local start
+if header == '' then
+    start = new_start
+    redis.call('SET', KEYS[1], string.format('%08d', start))
+else
+    start = tonumber(header)
+    if new_start < start then
+        local body = redis.call('GETRANGE', KEYS[1], 8, -1)
+        redis.call('SET', KEYS[1], string.format('%08d', new_start) .. string.rep('\\0', (start - new_start) * 8) .. body)
+        start = new_start
+    end
+end
+for i = 2, #ARGV, 2 do
+    redis.call('SETRANGE', KEYS[1], 8 + (tonumber(ARGV[i]) - start) * 8, ARGV[i + 1])
+end
+return start
+"""
+
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend(CacheBackend):
+    """Redis, shared by every worker. Connects on first use."""
+
+    name = "redis"
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        enable_aof: bool = True,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.enable_aof = enable_aof
+        self._client: redis.Redis | None = None
+        self._rate_limit_scripts: dict = {}
+        self._client_lock = threading.Lock()
+        # redis.asyncio clients are bound to the event loop that created them.
+        # The server runs all request I/O on one long-lived loop per worker
+        # (main.on_io_loop), so in practice this holds a single pool.
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    sync_client = redis.Redis(
+                        host=self.host,
+                        port=self.port,
+                        db=self.db,
+                        decode_responses=True,
+                        retry_on_timeout=True,
+                        retry_on_error=[redis.exceptions.ConnectionError],
+                    )
+                    if self.enable_aof:
+                        self._configure_persistence(sync_client)
+                    self._client = sync_client
+        return self._client
+
+    def _configure_persistence(self, sync_client: redis.Redis) -> None:
+        try:
+            config = sync_client.config_get("appendonly")
+            if isinstance(config, dict) and config.get("appendonly") != "yes":
+                sync_client.config_set("appendonly", "yes")
+                print("Enabled Redis AOF persistence")
+        except redis.RedisError as e:
+            print(f"Warning: Could not configure Redis persistence: {e}")
+
+    def async_client(self, binary: bool = False) -> redis.asyncio.Redis:
+        """
+        Return a redis.asyncio client bound to the running event loop.
+
+        binary=True returns a client that leaves replies as bytes, for values
+        that are not UTF-8 text.
+        """
+        loop = asyncio.get_running_loop()
+        loop_clients = self._async_clients.setdefault(loop, {})
+        async_client = loop_clients.get(binary)
+        if async_client is None:
+            async_client = redis.asyncio.Redis(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                decode_responses=not binary,
+                retry_on_timeout=True,
+                retry_on_error=[redis.exceptions.ConnectionError],
+            )
+            loop_clients[binary] = async_client
+        return async_client
+
+    def get(self, key):
+        return cast(str | None, self.client.get(key))
+
+    def set(self, key, value, expire_seconds=None):
+        self.client.set(key, value, ex=expire_seconds)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def exists(self, key):
+        return bool(self.client.exists(key))
+
+    def incr(self, key, amount=1):
+        return cast(int, self.client.incrby(key, amount))
+
+    def expire(self, key, seconds):
+        self.client.expire(key, seconds)
+
+    def mget(self, keys):
+        return cast(List[Any], self.client.mget(keys))
+
+    def set_many(self, items, expire_seconds=None):
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            if expire_seconds:
+                pipe.set(key, value, ex=expire_seconds)
+            else:
+                pipe.set(key, value)
+        pipe.execute()
+
+    def rate_limit(
+        self,
+        algorithm,
+        rate_key,
+        blocked_key,
+        max_requests,
+        window_ms,
+        block_seconds,
+        cost,
+    ):
+        script = self._rate_limit_scripts.get(algorithm)
+        if script is None:
+            script = self.client.register_script(RATE_LIMIT_SCRIPTS[algorithm])
+            self._rate_limit_scripts[algorithm] = script
+        allowed, count, block_ttl = cast(
+            List[int],
+            script(
+                keys=[rate_key, blocked_key],
+                args=[max_requests, window_ms, block_seconds, cost],
+            ),
+        )
+        return allowed, count, block_ttl
+
+    async def hgetall_async(self, key):
+        return await self.async_client().hgetall(key)
+
+    async def hmget_async(self, key, fields):
+        return await self.async_client().hmget(key, fields)
+
+    async def replace_hash_async(self, key, mapping, expire_seconds=None):
+        pipe = self.async_client().pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        if expire_seconds is not None:
+            pipe.expire(key, expire_seconds)
+        await pipe.execute()
+
+    async def read_series_async(self, keys, first_day, last_day):
+        binary_client = self.async_client(binary=True)
+        script = binary_client.register_script(_READ_SERIES_LUA)
+        pipe = binary_client.pipeline(transaction=False)
+        for key in keys:
+            await script(keys=[key], args=[first_day, last_day], client=pipe)
+        replies = await pipe.execute()
+        return [(int(start_day), raw) for start_day, raw in replies]
+
+    async def write_series_async(self, key, points):
+        args: list = [min(points)]
+        for day, value in points.items():
+            args.extend([day, np.float64(value).astype("<f8").tobytes()])
+
+        binary_client = self.async_client(binary=True)
+        script = binary_client.register_script(_WRITE_SERIES_LUA)
+        await script(keys=[key], args=args)
+
+    async def exists_async(self, key):
+        return bool(await self.async_client().exists(key))
+
+    async def acquire_lock_async(self, name, timeout):
+        token = uuid.uuid4().hex
+        acquired = await self.async_client().set(
+            name, token, nx=True, px=int(timeout * 1000)
+        )
+        return token if acquired else None
+
+    async def release_lock_async(self, name, token):
+        async_client = self.async_client()
+        await async_client.register_script(_RELEASE_LOCK_LUA)(keys=[name], args=[token])
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Process-local store with the same semantics as RedisBackend.
+
+    For single-worker deployments, local development and benchmarks: no
+    network hop and no Redis needed, but nothing is shared between workers
+    or kept across restarts.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._data: dict[str, Any] = {}
+        self._expires: dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _live(self, key: str) -> Any:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+        return self._data.get(key)
+
+    def _store(self, key: str, value: Any, expire_seconds: float | None) -> None:
+        self._data[key] = value
+        if expire_seconds:
+            self._expires[key] = time.monotonic() + expire_seconds
+        else:
+            self._expires.pop(key, None)
+
+    def _ttl(self, key: str) -> int:
+        """Seconds left like Redis TTL: -2 if missing, -1 if it never expires."""
+        if self._live(key) is None:
+            return -2
+        deadline = self._expires.get(key)
+        if deadline is None:
+            return -1
+        return math.ceil(deadline - time.monotonic())
+
+    def get(self, key):
+        with self._lock:
+            value = self._live(key)
+            return value if isinstance(value, str) else None
+
+    def set(self, key, value, expire_seconds=None):
+        with self._lock:
+            self._store(key, value, expire_seconds)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+    def exists(self, key):
+        with self._lock:
+            return self._live(key) is not None
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._live(key) or 0) + amount
+            self._data[key] = str(value)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if self._live(key) is not None:
+                self._expires[key] = time.monotonic() + seconds
+
+    def mget(self, keys):
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def set_many(self, items, expire_seconds=None):
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, expire_seconds)
+
+    def rate_limit(
+        self,
+        algorithm,
+        rate_key,
+        blocked_key,
+        max_requests,
+        window_ms,
+        block_seconds,
+        cost,
+    ):
+        with self._lock:
+            block_ttl = self._ttl(blocked_key)
+            if block_ttl != -2:
+                return 0, -1, block_ttl
+
+            now_ms = int(time.time() * 1000)
+            if algorithm == "fixed_window":
+                count = self.incr(rate_key, cost)
+                if count == cost:
+                    self._expires[rate_key] = time.monotonic() + window_ms / 1000
+            elif algorithm == "sliding_window":
+                log = [t for t in self._live(rate_key) or [] if t > now_ms - window_ms]
+                log.extend([now_ms] * cost)
+                self._store(rate_key, log, window_ms / 1000)
+                count = len(log)
+            elif algorithm == "token_bucket":
+                tokens, ts = self._live(rate_key) or (max_requests, now_ms)
+                tokens = min(
+                    max_requests, tokens + (now_ms - ts) * max_requests / window_ms
+                )
+                tokens -= cost
+                self._store(rate_key, (tokens, now_ms), window_ms / 1000)
+                count = max_requests - math.floor(tokens)
+            else:
+                raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
+            if count > max_requests:
+                self._store(blocked_key, "1", block_seconds)
+                return 0, count, block_seconds
+            return 1, count, 0
+
+    async def hgetall_async(self, key):
+        with self._lock:
+            value = self._live(key)
+            return dict(value) if isinstance(value, dict) else {}
+
+    async def hmget_async(self, key, fields):
+        with self._lock:
+            value = self._live(key)
+            value = value if isinstance(value, dict) else {}
+            return [value.get(field) for field in fields]
+
+    async def replace_hash_async(self, key, mapping, expire_seconds=None):
+        with self._lock:
+            self._store(key, dict(mapping), expire_seconds)
+
+    async def read_series_async(self, keys, first_day, last_day):
+        replies = []
+        with self._lock:
+            for key in keys:
+                raw = self._live(key)
+                if not isinstance(raw, bytearray):
+                    replies.append((first_day, b""))
+                    continue
+                start = int(raw[:SERIES_HEADER_BYTES])
+                first = max(first_day, start)
+                if last_day < first:
+                    replies.append((first, b""))
+                    continue
+                offset = SERIES_HEADER_BYTES + (first - start) * 8
+                end = SERIES_HEADER_BYTES + (last_day - start + 1) * 8
+                replies.append((first, bytes(raw[offset:end])))
+        return replies
+
+    async def write_series_async(self, key, points):
+        new_start = min(points)
+        with self._lock:
+            raw = self._live(key)
+            if not isinstance(raw, bytearray):
+                raw = bytearray(b"%08d" % new_start)
+            start = int(raw[:SERIES_HEADER_BYTES])
+            if new_start < start:
+                raw = (
+                    bytearray(b"%08d" % new_start)
+                    + bytes((start - new_start) * 8)
+                    + raw[SERIES_HEADER_BYTES:]
+                )
+                start = new_start
+            for day, value in points.items():
+                offset = SERIES_HEADER_BYTES + (day - start) * 8
+                if len(raw) < offset:
+                    raw.extend(bytes(offset - len(raw)))
+                raw[offset : offset + 8] = np.float64(value).astype("<f8").tobytes()
+            self._store(key, raw, None)
+
+    async def exists_async(self, key):
+        return self.exists(key)
+
+    async def acquire_lock_async(self, name, timeout):
+        token = uuid.uuid4().hex
+        with self._lock:
+            if self._live(name) is not None:
+                return None
+            self._store(name, token, timeout)
+        return token
+
+    async def release_lock_async(self, name, token):
+        with self._lock:
+            if self._live(name) == token:
+                self.delete(name)
+
+
+def create_backend(name: str | None = None) -> CacheBackend:
+    """Build the backend named by name or CACHE_BACKEND ("redis" or "memory")."""
+    name = (name or os.getenv("CACHE_BACKEND", "redis")).lower()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            db=int(os.getenv("REDIS_DB", 0)),
+            enable_aof=os.getenv("REDIS_ENABLE_AOF", "true").lower() == "true",
+        )
+    raise ValueError(f"Unknown cache backend: {name}")
@@ -0,0 +1,221 @@
+"""
+End-to-end latency and throughput per route, through the Flask app.
+
+    python benchmarks/bench_e2e.py --output e2e.json
+    python benchmarks/bench_e2e.py --cache-backend memory --concurrency 8
+
+currencyapi is replaced by an in-process fake (optionally with added
+latency). The cache is CACHE_BACKEND as configured (Redis at
+REDIS_HOST/REDIS_PORT by default), the in-process memory backend with
+--cache-backend memory, or the Redis backend against an in-memory fakeredis
+server with --fake-redis (see requirements.txt here).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from common import print_table, summarize, time_calls, write_report
+
+os.environ["BACKGROUND_REFRESH"] = "false"
+
+
+def use_fake_redis() -> None:
+    """Point every redis client the app creates at one in-memory server."""
+    import fakeredis
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    ignored = ("host", "port", "db", "retry", "retry_on_timeout", "retry_on_error")
+
+    class FakeRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, **kwargs):
+            for name in ignored:
+                kwargs.pop(name, None)
+            super().__init__(server=server, **kwargs)
+
+    class FakeAsyncRedis(fakeredis.FakeAsyncRedis):
+        def __init__(self, *args, **kwargs):
+            for name in ignored:
+                kwargs.pop(name, None)
+            super().__init__(server=server, **kwargs)
+
+    redis.Redis = FakeRedis
+    redis.asyncio.Redis = FakeAsyncRedis
+
+
+def fake_currencyapi(symbols: list[str], latency_ms: float) -> httpx.MockTransport:
+    """currencyapi /latest and /historical answering from seeded random rates."""
+    rng = np.random.default_rng(0)
+    usd = dict(zip(symbols, rng.uniform(0.01, 1000, len(symbols)).tolist()))
+    usd["USD"] = 1.0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        params = request.url.params
+        base = usd.get(params.get("base_currency") or "USD", 1.0)
+        wanted = params.get("currencies")
+        codes = wanted.split(",") if wanted else list(usd)
+        day = params.get("date")
+        drift = 1 + int(day.replace("-", "")) % 100 / 1000 if day else 1.0
+        return httpx.Response(
+            200,
+            json={
+                "meta": {
+                    "last_updated_at": (
+                        f"{day}T23:59:59Z" if day else "2026-01-01T00:00:00Z"
+                    )
+                },
+                "data": {
+                    c: {"code": c, "value": usd[c] / base * drift}
+                    for c in codes
+                    if c in usd
+                },
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+# (name, method, path, json body, curl client)
+ROUTES = [
+    ("get_rates_json", "GET", "/USD/EUR,GBP,JPY,BTC", None, False),
+    ("get_rates_all_json", "GET", "/EUR", None, False),
+    ("get_rates_curl", "GET", "/USD/EUR,GBP,JPY,BTC?width=120", None, True),
+    ("get_historical_rates_30d_json", "GET", "/last/USD/EUR,BTC/30d", None, False),
+    ("get_historical_rates_1y_json", "GET", "/last/USD/EUR/1y", None, False),
+    ("get_historical_rates_30d_curl", "GET", "/last/USD/EUR/30d?width=120", None, True),
+    ("get_conversion_json", "GET", "/convert/100/USD/EUR,BTC", None, False),
+    (
+        "post_conversions_1000",
+        "POST",
+        "/convert",
+        {"conversions": [[i, "USD", "EUR"] for i in range(1000)]},
+        False,
+    ),
+    (
+        "get_bulk_rates_10_bases",
+        "POST",
+        "/bulk",
+        {
+            "requests": [
+                {"base": b, "targets": ["USD", "EUR", "GBP", "BTC"]}
+                for b in [
+                    "USD",
+                    "EUR",
+                    "GBP",
+                    "JPY",
+                    "CHF",
+                    "CAD",
+                    "AUD",
+                    "BTC",
+                    "ETH",
+                    "SOL",
+                ]
+            ]
+        },
+        False,
+    ),
+    ("get_rate_matrix_json", "GET", "/matrix/USD,EUR,GBP,JPY,BTC,ETH", None, False),
+]
+
+
+def run_route(app, route, requests_per_route, concurrency, warmup) -> dict:
+    name, method, path, body, curl = route
+    ip_counter = iter(range(10**9))
+    ip_lock = threading.Lock()
+
+    def send(client):
+        # A fresh client IP per request keeps the rate limiter in the measured
+        # path without ever tripping it.
+        with ip_lock:
+            n = next(ip_counter)
+        headers = {"X-Forwarded-For": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"}
+        if curl:
+            headers["User-Agent"] = "curl/8.5.0"
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"{name}: {path} returned {response.status_code}")
+        return elapsed
+
+    local = threading.local()
+
+    def worker_send(_):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        return send(local.client)
+
+    warm_client = app.test_client()
+    for _ in range(warmup):
+        send(warm_client)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(worker_send, range(requests_per_route)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="per route")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0)
+    parser.add_argument("--cache-backend", choices=["redis", "memory"])
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument("--route", action="append", help="only run these routes")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.cache_backend:
+        os.environ["CACHE_BACKEND"] = args.cache_backend
+    if args.fake_redis:
+        use_fake_redis()
+
+    import main as app_main
+    from cache import check_rate_limit
+    from upstream import AsyncCurrencyClient
+
+    service = app_main.currency_service
+    service.client = AsyncCurrencyClient(
+        "bench",
+        transport=fake_currencyapi(
+            list(service.checker.all_symbols), args.upstream_latency_ms
+        ),
+    )
+
+    results = {}
+    for route in ROUTES:
+        if args.route and route[0] not in args.route:
+            continue
+        print(f"Running {route[0]}...", file=sys.stderr)
+        results[route[0]] = run_route(
+            app_main.app, route, args.requests, args.concurrency, args.warmup
+        )
+
+    if not args.route or "check_rate_limit" in args.route:
+        ips = iter(range(10**9))
+        results["check_rate_limit"] = time_calls(
+            lambda: check_rate_limit(f"bench-{next(ips)}", max_requests=20),
+            args.requests,
+        )
+
+    print_table(results)
+    write_report("e2e", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
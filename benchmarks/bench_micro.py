@@ -0,0 +1,95 @@
+"""
+Micro-benchmarks for CPU-bound hot paths on synthetic data.
+
+    python benchmarks/bench_micro.py --output micro.json
+
+Nothing here talks to Redis or the network: the functions below are pure,
+or read only the in-process caches.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from common import print_table, time_calls, write_report
+
+import renderer
+from cache import LocalCache
+from currency import Currency
+
+
+def synthetic_series(days: int, start_value: float, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    values = start_value * np.cumprod(1 + rng.normal(0, 0.01, days))
+    end = datetime(2026, 1, 1)
+    return {
+        (end - timedelta(days=days - 1 - i)).strftime("%Y-%m-%d"): {"value": float(v)}
+        for i, v in enumerate(values)
+    }
+
+
+def synthetic_usd_snapshot(symbols: list[str], seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {s: float(v) for s, v in zip(symbols, rng.uniform(0.01, 1000, len(symbols)))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--width", type=int, default=120)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    currency = Currency()
+    symbols = list(currency.checker.all_symbols)
+    snapshot = synthetic_usd_snapshot(symbols)
+    raw_rates = {s: {"code": s, "value": v} for s, v in snapshot.items()}
+    targets = [s for s in symbols if s != "USD"]
+
+    end = datetime(2026, 1, 1)
+    charts = {
+        "render_graph_30d_1_target": {"EUR": synthetic_series(30, 0.9, 1)},
+        "render_graph_365d_1_target": {"EUR": synthetic_series(365, 0.9, 2)},
+        "render_graph_365d_3_targets": {
+            "EUR": synthetic_series(365, 0.9, 3),
+            "GBP": synthetic_series(365, 0.8, 4),
+            "BTC": synthetic_series(365, 60000, 5),
+        },
+    }
+
+    local = LocalCache(max_entries=256, name="bench")
+    local.set("snapshot:USD", snapshot, ttl_seconds=3600)
+
+    def chart(data: dict):
+        days = len(next(iter(data.values())))
+        return lambda: renderer.render_graph(
+            {"data": data}, end - timedelta(days=days), end, args.width
+        )
+
+    benchmarks = {f"{name}_w{args.width}": chart(data) for name, data in charts.items()}
+    benchmarks.update(
+        {
+            f"render_table_{len(targets)}_rows": lambda: renderer.render_table(
+                {t: snapshot[t] for t in targets}, "USD", args.width
+            ),
+            f"normalize_rates_{len(raw_rates)}": lambda: currency._normalize_rates(
+                raw_rates
+            ),
+            f"cross_rates_1x{len(targets)}": lambda: currency._cross_rates(
+                snapshot, "USD", targets
+            ),
+            f"cross_rate_matrix_{len(symbols)}x{len(symbols)}": lambda: currency._cross_rate_matrix(
+                snapshot, symbols, symbols
+            ),
+            "local_cache_hit": lambda: local.get("snapshot:USD"),
+        }
+    )
+
+    results = {name: time_calls(fn, args.iterations) for name, fn in benchmarks.items()}
+    print_table(results)
+    write_report("micro", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
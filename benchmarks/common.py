@@ -0,0 +1,85 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def summarize(samples: list[float], wall_seconds: float | None = None) -> dict:
+    """p50/p99/mean in milliseconds plus throughput for per-call timings."""
+    timings = np.asarray(samples, dtype=np.float64) * 1000
+    wall_seconds = wall_seconds if wall_seconds is not None else timings.sum() / 1000
+    return {
+        "count": int(timings.size),
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+        "mean_ms": round(float(timings.mean()), 4),
+        "max_ms": round(float(timings.max()), 4),
+        "per_second": round(timings.size / wall_seconds, 1) if wall_seconds else None,
+    }
+
+
+def time_calls(fn, iterations: int, warmup: int = 10) -> dict:
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - call_started)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(suite: str, results: dict, output: str | None) -> None:
+    """Write results as JSON to output (or stdout) with enough context to compare runs."""
+    report = {
+        "suite": suite,
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(results)} results to {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def print_table(results: dict) -> None:
+    print(
+        f"{'BENCHMARK':<40} {'P50 MS':>10} {'P99 MS':>10} {'PER SEC':>12}",
+        file=sys.stderr,
+    )
+    for name, stats in results.items():
+        print(
+            f"{name:<40} {stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f} {stats['per_second'] or 0:>12,.1f}",
+            file=sys.stderr,
+        )
@@ -0,0 +1,61 @@
+"""
+Compare two benchmark reports written by bench_micro.py or bench_e2e.py.
+
+    python benchmarks/compare.py before.json after.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def change(before, after) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="exit 1 if any p50 regresses by more than this percentage",
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'BENCHMARK':<40} {'P50':>10} {'P99':>10} {'PER SEC':>10}")
+
+    regressed = []
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print(f"{name:<40} {'new':>10}")
+            continue
+        print(
+            f"{name:<40} {change(old['p50_ms'], new['p50_ms']):>10} {change(old['p99_ms'], new['p99_ms']):>10} {change(old['per_second'], new['per_second']):>10}"
+        )
+        if (
+            args.threshold is not None
+            and old["p50_ms"]
+            and (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 > args.threshold
+        ):
+            regressed.append(name)
+
+    if regressed:
+        print(f"Regressed beyond {args.threshold}%: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,128 @@
 import json
 import os
-from typing import Any, List, cast
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
 
-import redis
+import numpy as np
 from dotenv import load_dotenv
-from redis.retry import Retry
-from redis.backoff import ExponentialBackoff
 
-retry = Retry(ExponentialBackoff(), 5)
+from backends import RATE_LIMIT_ALGORITHMS, create_backend
+from metrics import (
+    CACHE_REQUESTS,
+    LOCAL_CACHE_ENTRIES,
+    count_cache_lookups,
+    key_prefix,
+    register_collector,
+    stage_timer,
+)
 
 load_dotenv()
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-
-client = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    decode_responses=True,
-    retry_on_timeout=True,
-    retry_on_error=[redis.exceptions.ConnectionError],
+
+# Shared store behind every cache below, chosen by CACHE_BACKEND ("redis" by
+# default, or "memory" for a single process). It connects on first use.
+backend = create_backend()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL.
+
+    Sits in front of Redis for decoded values that are read on every request
+    but change rarely, so hot entries cost neither a network hop nor a JSON
+    decode. Safe to share between threads.
+    """
+
+    def __init__(
+        self, max_entries: int = 256, name: str = "local", prefixed_keys: bool = True
+    ) -> None:
+        self.max_entries = max_entries
+        # name and the key prefix label hit/miss metrics; caches keyed by
+        # raw values (IPs) set prefixed_keys=False to keep cardinality flat.
+        self.name = name
+        self.prefixed_keys = prefixed_keys
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                self._count(key, "miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        self._count(key, "hit")
+        return entry[1]
+
+    def _count(self, key: str, result: str) -> None:
+        prefix = key_prefix(key) if self.prefixed_keys else self.name
+        CACHE_REQUESTS.inc(layer=self.name, prefix=prefix, result=result)
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        if ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+local_cache = LocalCache(max_entries=int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 256)))
+
+# Final rendered terminal output, keyed by everything that shapes it.
+render_cache = LocalCache(
+    max_entries=int(os.getenv("RENDER_CACHE_MAX_ENTRIES", 512)), name="render"
+)
+
+# Rate matrices and their encoded bodies are large, so they get a small LRU
+# of their own instead of evicting snapshots and rendered charts.
+matrix_cache = LocalCache(
+    max_entries=int(os.getenv("MATRIX_CACHE_MAX_ENTRIES", 16)), name="matrix"
 )
 
-try:
-    config = client.config_get("appendonly")
-    if isinstance(config, dict) and config.get("appendonly") != "yes":
-        client.config_set("appendonly", "yes")
-        print("Enabled Redis AOF persistence")
-except redis.RedisError as e:
-    print(f"Warning: Could not configure Redis persistence: {e}")
 
+def _collect_local_cache_sizes() -> None:
+    for cache in (local_cache, render_cache, matrix_cache, blocked_ip_cache):
+        LOCAL_CACHE_ENTRIES.set(cache.stats()["size"], cache=cache.name)
 
-def get_cache_batch(keys: list, prefix: str):
-    if not keys:
-        return {}
 
+register_collector(_collect_local_cache_sizes)
+
+
+def _full_keys(keys: list, prefix: str) -> list:
     if prefix:
-        full_keys = [f"{prefix}:{k}" for k in keys]
-    else:
-        full_keys = keys
+        return [f"{prefix}:{k}" for k in keys]
+    return keys
 
-    values = cast(List[Any], client.mget(full_keys))
 
+def _decode_batch(keys: list, values: list) -> dict:
     result = {}
     for k, v in zip(keys, values):
         if v is not None:
@@ -56,37 +136,108 @@ def get_cache_batch(keys: list, prefix: str):
     return result
 
 
+def get_cache_batch(keys: list, prefix: str):
+    if not keys:
+        return {}
+
+    full_keys = _full_keys(keys, prefix)
+    with stage_timer("cache_mget"):
+        values = backend.mget(full_keys)
+    count_cache_lookups(backend.name, full_keys, values)
+    return _decode_batch(keys, values)
+
+
+def _encode_batch(data: dict, prefix: str) -> dict:
+    return {(f"{prefix}:{k}" if prefix else k): json.dumps(v) for k, v in data.items()}
+
+
+def _expiry_seconds(expire_hours) -> int | None:
+    return int(expire_hours * 3600) if expire_hours is not None else None
+
+
 def set_cache_batch(data: dict, prefix: str, expire_hours=6):
     if not data:
         return
 
-    pipe = client.pipeline()
-    expiry_seconds = expire_hours * 3600 if expire_hours is not None else None
+    with stage_timer("cache_pipeline"):
+        backend.set_many(_encode_batch(data, prefix), _expiry_seconds(expire_hours))
 
-    for k, v in data.items():
-        if prefix:
-            key = f"{prefix}:{k}"
-        else:
-            key = k
 
-        if expiry_seconds:
-            pipe.set(key, json.dumps(v), ex=expiry_seconds)
-        else:
-            pipe.set(key, json.dumps(v))
+async def get_hash_async(key: str, fields: list | None = None) -> dict:
+    """
+    Read a hash written by set_hash_async.
+
+    Reads the whole hash, or only some fields when given; requested fields
+    that are absent map to None.
+    """
+    if fields is None:
+        with stage_timer("cache_hgetall"):
+            raw = await backend.hgetall_async(key)
+        count_cache_lookups(backend.name, [key], [raw or None])
+        return _decode_batch(list(raw.keys()), list(raw.values()))
+
+    if not fields:
+        return {}
+
+    with stage_timer("cache_hmget"):
+        values = await backend.hmget_async(key, fields)
+    count_cache_lookups(backend.name, [key] * len(fields), values)
+    return _decode_batch(fields, values)
+
+
+async def set_hash_async(key: str, data: dict, expire_hours=6) -> None:
+    """Atomically replace the hash at key and give it a single TTL."""
+    if not data:
+        return
+
+    with stage_timer("cache_pipeline"):
+        await backend.replace_hash_async(
+            key,
+            {k: json.dumps(v) for k, v in data.items()},
+            _expiry_seconds(expire_hours),
+        )
+
+
+async def read_series_async(keys: list, first_day: int, last_day: int) -> dict:
+    """
+    Read days [first_day, last_day] from several series in one round trip.
+
+    Returns {key: (start_day, values)} where values is a float64 array whose
+    first element is day start_day; days that were never written are NaN and
+    the array stops at the last stored day.
+    """
+    if not keys:
+        return {}
 
-    pipe.execute()
+    with stage_timer("cache_series_read"):
+        replies = await backend.read_series_async(keys, first_day, last_day)
+    count_cache_lookups(backend.name, keys, [raw or None for _, raw in replies])
+
+    result = {}
+    for key, (start_day, raw) in zip(keys, replies):
+        values = np.frombuffer(raw, dtype="<f8").copy()
+        values[values == 0] = np.nan
+        result[key] = (start_day, values)
+    return result
+
+
+async def write_series_async(key: str, points: dict) -> None:
+    """Merge {day_number: value} points into the series at key."""
+    points = {day: value for day, value in points.items() if value}
+    if not points:
+        return
+
+    with stage_timer("cache_series_write"):
+        await backend.write_series_async(key, points)
 
 
 def get_cache(key):
-    data = client.get(key)
+    data = backend.get(key)
     return data if data else None
 
 
 def set_cache(key, data, expire_hours: int | None = 6):
-    if expire_hours is None:
-        client.set(key, json.dumps(data))
-    else:
-        client.set(key, json.dumps(data), ex=expire_hours * 3600)
+    backend.set(key, json.dumps(data), _expiry_seconds(expire_hours))
 
 
 RATE_LIMIT_PREFIX = "rate_limit"
@@ -96,13 +247,13 @@ BLOCKED_IPS_PREFIX = "blocked_ip"
 def is_ip_blocked(ip_address: str) -> bool:
     """Check if an IP address is currently blocked."""
     blocked_key = f"{BLOCKED_IPS_PREFIX}:{ip_address}"
-    return bool(client.exists(blocked_key))
+    return backend.exists(blocked_key)
 
 
 def block_ip(ip_address: str, duration_minutes: int = 60) -> None:
     """Block an IP address for a specified duration."""
     blocked_key = f"{BLOCKED_IPS_PREFIX}:{ip_address}"
-    client.setex(blocked_key, duration_minutes * 60, "1")
+    backend.set(blocked_key, "1", duration_minutes * 60)
 
 
 def increment_request_count(ip_address: str, window_minutes: int = 1) -> int:
@@ -111,23 +262,63 @@ def increment_request_count(ip_address: str, window_minutes: int = 1) -> int:
     Returns the current request count in the time window.
     """
     rate_key = f"{RATE_LIMIT_PREFIX}:{ip_address}"
-    count = cast(int, client.incr(rate_key))
+    count = backend.incr(rate_key)
 
     if count == 1:
-        client.expire(rate_key, window_minutes * 60)
+        backend.expire(rate_key, window_minutes * 60)
 
     return count
 
 
+# Per-worker view of blocked IPs, kept until their block expires, so repeat
+# offenders are rejected without touching Redis.
+blocked_ip_cache = LocalCache(
+    max_entries=int(os.getenv("BLOCKED_IP_CACHE_MAX_ENTRIES", 10000)),
+    name="blocked_ip",
+    prefixed_keys=False,
+)
+
+# Requests counted locally and not yet flushed to Redis:
+# {rate_key: [pending_count, first_pending_monotonic]}.
+_pending_requests: dict[str, list] = {}
+_pending_lock = threading.Lock()
+
+
+def _take_pending_requests(
+    rate_key: str, local_batch_size: int, local_sync_seconds: float
+) -> int:
+    """
+    Count one request locally and return how many to flush to Redis now,
+    or 0 while the batch is still filling.
+    """
+    now = time.monotonic()
+    with _pending_lock:
+        entry = _pending_requests.setdefault(rate_key, [0, now])
+        entry[0] += 1
+        if entry[0] < local_batch_size and now - entry[1] < local_sync_seconds:
+            return 0
+        del _pending_requests[rate_key]
+        return entry[0]
+
+
 def check_rate_limit(
     ip_address: str,
     max_requests: int = 100,
     window_minutes: int = 1,
     block_duration_minutes: int = 60,
+    algorithm: str = "fixed_window",
+    local_batch_size: int = 1,
+    local_sync_seconds: float = 1.0,
 ) -> dict:
     """
     Check if an IP has exceeded rate limits.
 
+    algorithm is one of "fixed_window", "sliding_window" or "token_bucket".
+    With local_batch_size > 1 requests are pre-counted in this worker and
+    sent to Redis once the batch fills or local_sync_seconds have passed, so
+    each worker may let through up to local_batch_size - 1 requests beyond
+    the limit before the block lands.
+
     Returns a dict with:
     - allowed: bool - Whether the request is allowed
     - count: int - Current request count in window
@@ -135,18 +326,50 @@ def check_rate_limit(
     - blocked: bool - Whether the IP is blocked
     - message: str - Reason if blocked
     """
+    if algorithm not in RATE_LIMIT_ALGORITHMS:
+        raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
 
-    if is_ip_blocked(ip_address):
-        return {
-            "allowed": False,
-            "blocked": True,
-            "message": "IP address is temporarily blocked due to rate limit violation",
-        }
+    blocked_response = {
+        "allowed": False,
+        "blocked": True,
+        "message": "IP address is temporarily blocked due to rate limit violation",
+    }
 
-    current_count = increment_request_count(ip_address, window_minutes)
+    if blocked_ip_cache.get(ip_address):
+        return blocked_response
+
+    rate_key = f"{RATE_LIMIT_PREFIX}:{algorithm}:{ip_address}"
+    blocked_key = f"{BLOCKED_IPS_PREFIX}:{ip_address}"
 
-    if current_count > max_requests:
-        block_ip(ip_address, block_duration_minutes)
+    cost = 1
+    if local_batch_size > 1:
+        cost = _take_pending_requests(rate_key, local_batch_size, local_sync_seconds)
+        if not cost:
+            return {
+                "allowed": True,
+                "count": None,
+                "limit": max_requests,
+                "blocked": False,
+                "message": None,
+            }
+
+    allowed, current_count, block_ttl = backend.rate_limit(
+        algorithm,
+        rate_key,
+        blocked_key,
+        max_requests,
+        window_minutes * 60000,
+        block_duration_minutes * 60,
+        cost,
+    )
+
+    if not allowed and block_ttl > 0:
+        blocked_ip_cache.set(ip_address, True, ttl_seconds=block_ttl)
+
+    if current_count == -1:
+        return blocked_response
+
+    if not allowed:
         return {
             "allowed": False,
             "count": current_count,
@@ -165,12 +388,19 @@ def check_rate_limit(
 
 
 def reset_ip_rate_limit(ip_address: str) -> None:
-    """Reset rate limit counter for a specific IP."""
-    rate_key = f"{RATE_LIMIT_PREFIX}:{ip_address}"
-    client.delete(rate_key)
+    """Reset rate limit counters for a specific IP."""
+    backend.delete(
+        f"{RATE_LIMIT_PREFIX}:{ip_address}",
+        *(f"{RATE_LIMIT_PREFIX}:{name}:{ip_address}" for name in RATE_LIMIT_ALGORITHMS),
+    )
 
 
 def unblock_ip(ip_address: str) -> None:
-    """Immediately unblock an IP address."""
+    """
+    Immediately unblock an IP address.
+
+    Other workers keep rejecting it until their local block entry expires.
+    """
     blocked_key = f"{BLOCKED_IPS_PREFIX}:{ip_address}"
-    client.delete(blocked_key)
+    backend.delete(blocked_key)
+    blocked_ip_cache.delete(ip_address)
@@ -1,30 +1,159 @@
+import hashlib
 import os
+import threading
+from types import MappingProxyType
 
+import numpy as np
 
-class Currencies:
-    def __init__(self) -> None:
-        self.fiat_file = "Currencies/fiat.txt"
-        self.crypto_file = "Currencies/crypto.txt"
+CURRENCIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Currencies")
+REGISTRY_FILE = os.path.join(CURRENCIES_DIR, "registry.npy")
+FIAT_FILE = os.path.join(CURRENCIES_DIR, "fiat.txt")
+CRYPTO_FILE = os.path.join(CURRENCIES_DIR, "crypto.txt")
 
-        self.fiat_list = set()
-        self.crypto_list = set()
+# Built by Currencies/Tools/build_registry.py. The first record is a header
+# (symbol REGISTRY_HEADER, type 0) whose provider_id holds lists_digest() of
+# the lists it was built from; the rest are sorted by symbol.
+REGISTRY_DTYPE = np.dtype(
+    [
+        ("symbol", "S12"),
+        ("type", "u1"),
+        ("decimals", "i1"),
+        ("provider_id", "S16"),
+    ]
+)
+TYPE_CODES = {1: "FIAT", 2: "CRYPTO"}
+REGISTRY_HEADER = b"#LISTS"
 
-        if os.path.exists(self.fiat_file):
-            with open(self.fiat_file, "r") as f:
-                self.fiat_list = {line.strip().upper() for line in f if line.strip()}
 
-        if os.path.exists(self.crypto_file):
-            with open(self.crypto_file, "r") as c:
-                self.crypto_list = {line.strip().upper() for line in c if line.strip()}
+def lists_digest(fiat_file: str = FIAT_FILE, crypto_file: str = CRYPTO_FILE) -> bytes:
+    """Hex digest of the raw list files, compared without parsing them."""
+    digest = hashlib.blake2b(digest_size=8)
+    for file_path in (fiat_file, crypto_file):
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest().encode()
 
-    def check_which_type_of_currency(self, iso: str) -> str:
 
-        iso = iso.strip().upper()
+class _Registry:
+    def __init__(self, records: np.ndarray) -> None:
+        self.records = records
+        symbols = records["symbol"].astype(str).tolist()
+        types = [TYPE_CODES[code] for code in records["type"].tolist()]
+        self.symbol_types = MappingProxyType(dict(zip(symbols, types)))
+        self.all_symbols = tuple(symbols)
+
+
+_registry: _Registry | None = None
+_registry_lock = threading.Lock()
+
+
+def _read_text_registry() -> np.ndarray:
+    """The lists alone, for trees where registry.npy is missing or stale."""
+
+    def read_symbols(file_path):
+        if not os.path.exists(file_path):
+            return set()
+        with open(file_path, "r") as f:
+            return {line.strip().upper() for line in f if line.strip()}
+
+    # Fiat wins when a symbol is listed as both.
+    types = {iso: 2 for iso in read_symbols(CRYPTO_FILE)}
+    types.update({iso: 1 for iso in read_symbols(FIAT_FILE)})
+
+    records = np.zeros(len(types), dtype=REGISTRY_DTYPE)
+    for i, iso in enumerate(sorted(types)):
+        records[i] = (iso.encode(), types[iso], -1, iso.encode())
+    return records
+
+
+def _merge_registry(records: np.ndarray, text_records: np.ndarray) -> np.ndarray:
+    """
+    Symbols and types from the text lists, keeping the stale registry's
+    decimals and provider ids where they still apply.
+    """
+    merged = text_records.copy()
+    if len(records):
+        index = np.searchsorted(records["symbol"], merged["symbol"])
+        index = np.minimum(index, len(records) - 1)
+        same = (records["symbol"][index] == merged["symbol"]) & (
+            records["type"][index] == merged["type"]
+        )
+        merged[same] = records[index[same]]
+    return merged
+
 
-        if iso in self.fiat_list:
-            return "FIAT"
+def load_registry() -> _Registry:
+    """
+    Load the currency registry once per process.
+
+    registry.npy is memory-mapped and used as is while its header digest
+    matches the list files. If the lists were edited since it was built,
+    they are parsed instead (with a warning), so edits apply before the
+    registry is rebuilt.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = _Registry(_load_records())
+    return _registry
+
+
+def _load_records() -> np.ndarray:
+    if not os.path.exists(REGISTRY_FILE):
+        return _read_text_registry()
+
+    records = np.load(REGISTRY_FILE, mmap_mode="r")
+    has_header = len(records) > 0 and records[0]["symbol"] == REGISTRY_HEADER
+    if has_header and records[0]["provider_id"] == lists_digest(FIAT_FILE, CRYPTO_FILE):
+        return records[1:]
+
+    print(
+        "Warning: registry.npy is out of date with fiat.txt/crypto.txt, "
+        "run Currencies/Tools/build_registry.py"
+    )
+    return _merge_registry(
+        records[1:] if has_header else records, _read_text_registry()
+    )
+
+
+class Currencies:
+    @property
+    def symbol_types(self) -> MappingProxyType:
+        return load_registry().symbol_types
+
+    @property
+    def all_symbols(self) -> tuple:
+        return load_registry().all_symbols
+
+    def check_which_type_of_currency(self, iso: str) -> str:
+        currency_type = self.symbol_types.get(iso)
+        if currency_type is None:
+            currency_type = self.symbol_types.get(iso.strip().upper(), "UNKNOWN")
+        return currency_type
 
-        if iso in self.crypto_list:
-            return "CRYPTO"
+    def partition(self, symbols) -> dict:
+        """Split already upper-cased symbols by type in a single pass."""
+        groups = {"FIAT": [], "CRYPTO": [], "UNKNOWN": []}
+        symbol_types = self.symbol_types
+        for iso in symbols:
+            groups[symbol_types.get(iso, "UNKNOWN")].append(iso)
+        return groups
 
-        return "UNKNOWN"
+    def metadata(self, iso: str) -> dict | None:
+        """Registry record for iso: type, decimals (-1 if unknown), provider id."""
+        registry = load_registry()
+        symbols = registry.records["symbol"]
+        key = iso.strip().upper().encode()
+        index = int(np.searchsorted(symbols, key))
+        if index >= len(symbols) or symbols[index] != key:
+            return None
+        record = registry.records[index]
+        return {
+            "code": iso.strip().upper(),
+            "type": TYPE_CODES[int(record["type"])],
+            "decimals": int(record["decimals"]),
+            "provider_id": record["provider_id"].decode(),
+        }
@@ -1,25 +1,60 @@
-import json
+import asyncio
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List
 
-import currencyapicom
+import numpy as np
 from dotenv import load_dotenv
 
-from cache import get_cache, get_cache_batch, set_cache, set_cache_batch
+from aggregate import bucket_aggregate, bucket_points
+from archive import HistoryArchive
+from cache import (
+    get_hash_async,
+    local_cache,
+    matrix_cache,
+    read_series_async,
+    set_hash_async,
+    write_series_async,
+)
 from currencies import Currencies
+from metrics import stage_timer
+from refresher import BackgroundRefresher
+from singleflight import single_flight
+from upstream import AsyncCurrencyClient
 
 load_dotenv()
 
 
 class Currency:
     def __init__(self) -> None:
-        self.CACHE_PREFIX = "currency"
+        self.CACHE_PREFIX_SNAPSHOT = "snapshot"
         self.CACHE_PREFIX_HISTORICAL = "historical"
         self.CACHE_PREFIX_LATEST = "latest"
-        self.client = currencyapicom.Client(os.getenv("FIAT_FREE_CURRENCY_API_KEY"))
+        self.CACHE_PREFIX_SERIES = "series"
+        self.CACHE_PREFIX_MATRIX = "matrix"
+        self.SERIES_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+        # Stored for a past day upstream returned no rate for (e.g. before a
+        # coin existed), so it is not fetched again; rates are never negative.
+        self.SERIES_NOT_PROVIDED = -1.0
+        self.CACHE_EXPIRE_HOURS_LATEST = 1
+        self.CACHE_STALE_HOURS_LATEST = 24
+        self.AGGREGATE_FETCH_DAYS = int(os.getenv("AGGREGATE_FETCH_DAYS", "93"))
+        self.SNAPSHOT_BASE = "USD"
+        self.SNAPSHOT_FETCHED_AT_KEY = "_fetched_at"
+        self.SNAPSHOT_PREWARM_MARGIN_SECONDS = 300
+        self.client = AsyncCurrencyClient(os.getenv("FIAT_FREE_CURRENCY_API_KEY"))
         self.checker = Currencies()
-
+        self.refresher = BackgroundRefresher()
+        # Past days go to the on-disk archive instead of Redis unless
+        # HISTORY_ARCHIVE=false (e.g. several hosts sharing one Redis).
+        self.archive = (
+            HistoryArchive()
+            if os.getenv("HISTORY_ARCHIVE", "true").lower() == "true"
+            else None
+        )
+
+    @stage_timer("normalize")
     def _normalize_rates(self, raw_data: dict, invert: bool = False) -> dict:
         clean_rates = {}
         for iso, data in raw_data.items():
@@ -30,216 +65,729 @@ class Currency:
                 clean_rates[iso] = val
         return clean_rates
 
+    def _extract_value(self, data_dict, target: str):
+        if not isinstance(data_dict, dict) or "data" not in data_dict:
+            return None
+        entry = data_dict["data"].get(target)
+        value = entry.get("value") if isinstance(entry, dict) else None
+        return value if isinstance(value, (int, float)) else None
+
+    def _snapshot_key(self) -> str:
+        return f"{self.CACHE_PREFIX_SNAPSHOT}:{self.SNAPSHOT_BASE}"
+
+    async def _read_usd_snapshot(
+        self, symbols: list[str] | None = None
+    ) -> tuple[dict, float] | None:
+        """
+        Read the USD snapshot hash, or only the given symbols from it.
+
+        Full reads are kept in the local cache; partial reads are not, since
+        they would shadow the rest of the snapshot.
+        """
+        key = self._snapshot_key()
+
+        cached = local_cache.get(key)
+        if cached is not None:
+            return cached
+
+        fields = None if symbols is None else symbols + [self.SNAPSHOT_FETCHED_AT_KEY]
+        cached_hash = await get_hash_async(key, fields)
+
+        fetched_at = cached_hash.pop(self.SNAPSHOT_FETCHED_AT_KEY, None)
+        if not fetched_at:
+            return None
+
+        snapshot = {k: v for k, v in cached_hash.items() if isinstance(v, (int, float))}
+        if symbols is None:
+            self._remember_usd_snapshot(snapshot, fetched_at)
+        return snapshot, fetched_at
+
+    def _remember_usd_snapshot(self, snapshot: dict, fetched_at: float) -> None:
+        # Only hold it locally while it is fresh, so a refresh done by another
+        # worker is picked up from Redis once this copy goes stale.
+        fresh_for = fetched_at + self.CACHE_EXPIRE_HOURS_LATEST * 3600 - time.time()
+        local_cache.set(
+            self._snapshot_key(), (snapshot, fetched_at), ttl_seconds=fresh_for
+        )
+
+    async def _read_fresh_usd_snapshot(self) -> tuple[dict, float] | None:
+        cached = await self._read_usd_snapshot()
+        if cached and not self._is_stale(cached[1]):
+            return cached
+        return None
+
+    async def _fetch_usd_snapshot(self) -> tuple[dict, float]:
+        known = self.checker.symbol_types
+
+        response = await self.client.latest(base_currency=self.SNAPSHOT_BASE)
+        raw_rates = response.get("data", {})
+        snapshot = {
+            iso: val
+            for iso, val in self._normalize_rates(raw_rates).items()
+            if iso in known
+        }
+        snapshot[self.SNAPSHOT_BASE] = 1.0
+        fetched_at = time.time()
+
+        # The hash lives until the hard TTL; freshness is judged against
+        # fetched_at.
+        await set_hash_async(
+            self._snapshot_key(),
+            {**snapshot, self.SNAPSHOT_FETCHED_AT_KEY: fetched_at},
+            expire_hours=self.CACHE_STALE_HOURS_LATEST,
+        )
+        self._remember_usd_snapshot(snapshot, fetched_at)
+        return snapshot, fetched_at
+
+    def _is_stale(self, fetched_at: float, margin_seconds: float = 0) -> bool:
+        age = time.time() - fetched_at
+        return age >= self.CACHE_EXPIRE_HOURS_LATEST * 3600 - margin_seconds
+
+    async def _refresh_usd_snapshot(self) -> None:
+        await single_flight(
+            f"{self.CACHE_PREFIX_LATEST}:{self.SNAPSHOT_BASE}",
+            self._fetch_usd_snapshot,
+            recheck=self._read_fresh_usd_snapshot,
+        )
+
+    async def _prewarm_usd_snapshot(self) -> None:
+        cached = await self._read_usd_snapshot()
+        if cached is None or self._is_stale(
+            cached[1], margin_seconds=self.SNAPSHOT_PREWARM_MARGIN_SECONDS
+        ):
+            await self._refresh_usd_snapshot()
+
+    def start_background_refresh(self, interval_seconds: float = 60) -> None:
+        """Keep the USD snapshot warm so requests never wait on currencyapi."""
+        self.refresher.schedule(
+            "prewarm:usd_snapshot", self._prewarm_usd_snapshot, interval_seconds
+        )
+
+    async def _get_usd_snapshot_entry(
+        self, symbols: list[str] | None = None
+    ) -> tuple[dict, float]:
+        cached = await self._read_usd_snapshot(symbols)
+        if cached:
+            if self._is_stale(cached[1]):
+                # Serve the stale snapshot now and revalidate behind the request.
+                self.refresher.submit(
+                    "refresh:usd_snapshot", self._refresh_usd_snapshot
+                )
+            return cached
+
+        return await single_flight(
+            f"{self.CACHE_PREFIX_LATEST}:{self.SNAPSHOT_BASE}",
+            self._fetch_usd_snapshot,
+            recheck=self._read_usd_snapshot,
+        )
+
+    async def _get_usd_snapshot(self, symbols: list[str] | None = None) -> dict:
+        snapshot, _ = await self._get_usd_snapshot_entry(symbols)
+        return snapshot
+
+    async def get_data_version(self) -> str:
+        """
+        Identify the rate snapshot currently being served.
+
+        Everything derived from the snapshot (tables, today's chart point)
+        can be cached against this value.
+        """
+        _, fetched_at = await self._get_usd_snapshot_entry(symbols=[])
+        return f"{fetched_at:.0f}"
+
+    @stage_timer("cross_rates")
+    def _cross_rate_matrix(
+        self, snapshot: dict, bases: list[str], targets: list[str]
+    ) -> np.ndarray:
+        """
+        Derive a len(bases) x len(targets) rate matrix from a USD snapshot.
+
+        rate = usd[target] / usd[base], inverted when exactly one side of the
+        pair is a crypto currency so crypto prices read as base units per coin.
+        Pairs with no rate on either side are NaN.
+        """
+        base_usd = np.array([snapshot.get(b, np.nan) for b in bases], dtype=np.float64)
+        usd = np.array([snapshot.get(t, np.nan) for t in targets], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = usd[np.newaxis, :] / base_usd[:, np.newaxis]
+
+        symbol_types = self.checker.symbol_types
+        base_is_crypto = np.fromiter(
+            (symbol_types.get(b) == "CRYPTO" for b in bases),
+            dtype=bool,
+            count=len(bases),
+        )
+        target_is_crypto = np.fromiter(
+            (symbol_types.get(t) == "CRYPTO" for t in targets),
+            dtype=bool,
+            count=len(targets),
+        )
+        invert = target_is_crypto[np.newaxis, :] != base_is_crypto[:, np.newaxis]
+        with np.errstate(divide="ignore"):
+            return np.where(invert & (rates != 0), 1 / rates, rates)
+
+    def _cross_rates(self, snapshot: dict, base: str, targets: list[str]) -> dict:
+        """Derive base -> target rates from a USD snapshot."""
+        if not snapshot.get(base):
+            raise ValueError(f"No rate available for base currency {base}")
+
+        rates = self._cross_rate_matrix(snapshot, [base], targets)[0]
+        return {t: (None if np.isnan(r) else float(r)) for t, r in zip(targets, rates)}
+
+    def _warn_unknown(self, symbols: list[str]) -> None:
+        unknown_currencies = self.checker.partition(symbols)["UNKNOWN"]
+        if unknown_currencies:
+            print(f"Warning: Unknown currencies requested: {unknown_currencies}")
+
     async def get_rates(self, symbols: list[str] | None = None, base: str = "USD"):
         base = base.upper()
-        is_crypto_base = self.checker.check_which_type_of_currency(base) == "CRYPTO"
-
-        cache_expire_hours = 1
-
-        prefix = f"{self.CACHE_PREFIX}:{base}"
 
         if not symbols or "LATEST" in [s.upper() for s in symbols]:
-            prefix = f"{self.CACHE_PREFIX_LATEST}:{base}"
-            all_symbols = list(self.checker.fiat_list | self.checker.crypto_list)
+            snapshot = await self._get_usd_snapshot()
+            targets = [s for s in self.checker.all_symbols if s in snapshot]
+            return self._cross_rates(snapshot, base, targets)
+
+        symbols = [s.upper() for s in symbols]
+        snapshot = await self._get_usd_snapshot(symbols=[base] + symbols)
+
+        self._warn_unknown(symbols)
+
+        return self._cross_rates(snapshot, base, symbols)
+
+    async def get_bulk_rates(
+        self, pairs: list[tuple[str, list[str] | None]]
+    ) -> list[dict]:
+        """
+        Answer several (base, targets) requests from one snapshot read.
+
+        All pairs are computed as a single bases x targets matrix and sliced
+        per request. Empty targets mean every known symbol, as in get_rates.
+        Results come back in request order as {"base", "data"} entries.
+        """
+        pairs = [
+            (base.upper(), [s.upper() for s in targets] if targets else None)
+            for base, targets in pairs
+        ]
+        wants_all = any(targets is None for _, targets in pairs)
+
+        requested = {base for base, _ in pairs}
+        for _, targets in pairs:
+            requested.update(targets or [])
+        snapshot = await self._get_usd_snapshot(
+            symbols=None if wants_all else sorted(requested)
+        )
+
+        bases = sorted({base for base, _ in pairs})
+        for base in bases:
+            if not snapshot.get(base):
+                raise ValueError(f"No rate available for base currency {base}")
+
+        all_targets = [s for s in self.checker.all_symbols if s in snapshot]
+        columns = sorted(requested.union(all_targets if wants_all else []))
+        matrix = self._cross_rate_matrix(snapshot, bases, columns)
+        row_of = {base: i for i, base in enumerate(bases)}
+        column_of = {symbol: i for i, symbol in enumerate(columns)}
+
+        self._warn_unknown(sorted(requested))
+
+        results = []
+        for base, targets in pairs:
+            targets = targets or all_targets
+            row = matrix[row_of[base], [column_of[t] for t in targets]]
+            results.append(
+                {
+                    "base": base,
+                    "data": {
+                        t: (None if np.isnan(r) else float(r))
+                        for t, r in zip(targets, row)
+                    },
+                }
+            )
+        return results
+
+    async def convert(self, rows: list[tuple[float, str, str]]) -> list[dict]:
+        """
+        Convert (amount, from, to) rows using the current snapshot.
+
+        Unlike the rate tables this is the plain ratio usd[to] / usd[from],
+        with no crypto orientation: 1 USD -> BTC yields a fraction of a coin.
+        rate and result are None when either currency has no rate.
+        """
+        sources = [source.upper() for _, source, _ in rows]
+        destinations = [destination.upper() for _, _, destination in rows]
+        symbols = sorted(set(sources).union(destinations))
+        snapshot = await self._get_usd_snapshot(symbols=symbols)
+
+        self._warn_unknown(symbols)
+
+        amounts = np.array([amount for amount, _, _ in rows], dtype=np.float64)
+        usd = np.array([snapshot.get(s) or np.nan for s in symbols], dtype=np.float64)
+        index_of = {s: i for i, s in enumerate(symbols)}
+        from_usd = usd[[index_of[s] for s in sources]]
+        to_usd = usd[[index_of[s] for s in destinations]]
+        rates = to_usd / from_usd
+        results = amounts * rates
+
+        return [
+            {
+                "amount": float(amount),
+                "from": source,
+                "to": destination,
+                "rate": None if np.isnan(rate) else float(rate),
+                "result": None if np.isnan(result) else float(result),
+            }
+            for amount, source, destination, rate, result in zip(
+                amounts, sources, destinations, rates, results
+            )
+        ]
+
+    async def get_rate_matrix(
+        self, symbols: list[str] | None = None
+    ) -> tuple[list[str], np.ndarray, float]:
+        """
+        Full cross-rate matrix for symbols (every known symbol if omitted).
+
+        matrix[i, j] is the symbols[i] -> symbols[j] rate exactly as get_rates
+        reports it, NaN where either side has no rate. The read-only array is
+        built once per snapshot and symbol set and kept in matrix_cache.
+        Unknown symbols raise ValueError. Returns (symbols, matrix, fetched_at).
+        """
+        if symbols:
+            symbols = list(dict.fromkeys(s.upper() for s in symbols))
+            unknown_currencies = self.checker.partition(symbols)["UNKNOWN"]
+            if unknown_currencies:
+                raise ValueError(f"Unknown currencies: {', '.join(unknown_currencies)}")
+        # An empty list would read only the snapshot's timestamp.
+        snapshot, fetched_at = await self._get_usd_snapshot_entry(symbols or None)
+        if not symbols:
+            symbols = [s for s in self.checker.all_symbols if s in snapshot]
+        if not symbols:
+            raise ValueError("No rates available for a matrix")
+
+        cache_key = f"{self.CACHE_PREFIX_MATRIX}:{fetched_at:.0f}:{','.join(symbols)}"
+        matrix = matrix_cache.get(cache_key)
+        if matrix is None:
+            matrix = self._cross_rate_matrix(snapshot, symbols, symbols)
+            matrix.setflags(write=False)
+            matrix_cache.set(
+                cache_key,
+                matrix,
+                ttl_seconds=self.CACHE_EXPIRE_HOURS_LATEST * 3600,
+            )
+        return symbols, matrix, fetched_at
 
-            cached_batch = get_cache_batch(keys=all_symbols, prefix=prefix)
+    def _series_key(self, base: str, target: str) -> str:
+        return f"{self.CACHE_PREFIX_SERIES}:{base}:{target}"
 
-            cached_rates = {k: v for k, v in cached_batch.items() if v is not None}
+    def _day_number(self, date_str: str) -> int:
+        return date.fromisoformat(date_str).toordinal() - self.SERIES_EPOCH_ORDINAL
 
-            if len(cached_rates) == len(all_symbols):
-                return cached_rates
+    async def _read_points(
+        self,
+        base: str,
+        dates: List[str],
+        targets: List[str],
+        today_str: str,
+        failed: list | None = None,
+    ) -> tuple[dict, str | None]:
+        """
+        Return known {(date, target): value} for the given dates.
+
+        Today's point is derived from the shared USD snapshot, so it never
+        costs an upstream call of its own; past days come from storage. If
+        the snapshot cannot be read, today is appended to failed.
+        """
+        values = {}
+        last_updated_at = None
 
-            api_base = "USD" if is_crypto_base else base
-            response = self.client.latest(base_currency=api_base)
-            raw_rates = response.get("data", {})
-            rates = self._normalize_rates(raw_rates, invert=is_crypto_base)
-            set_cache_batch(rates, prefix=prefix, expire_hours=cache_expire_hours)
-            return rates
+        if today_str in dates:
+            try:
+                snapshot, fetched_at = await self._get_usd_snapshot_entry(
+                    [base, *targets]
+                )
+            except Exception as e:
+                print(f"API Error: {e}")
+                snapshot = {}
+                if failed is not None:
+                    failed.append(today_str)
+            base_usd = snapshot.get(base)
+            if base_usd:
+                # Same orientation as the upstream series (target per base);
+                # crypto targets are inverted along with the rest of it.
+                for target in targets:
+                    target_usd = snapshot.get(target)
+                    if target_usd is not None:
+                        values[(today_str, target)] = target_usd / base_usd
+                last_updated_at = datetime.fromtimestamp(
+                    fetched_at, timezone.utc
+                ).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        past_dates = [d for d in dates if d != today_str]
+        if not past_dates:
+            return values, last_updated_at
+
+        days = np.array([self._day_number(d) for d in past_dates], dtype=np.int64)
+        past_values = await self._read_past_days(base, targets, days)
+
+        for target, picked in past_values.items():
+            for date_str, value in zip(past_dates, picked):
+                if np.isnan(value):
+                    continue
+                # None marks a day known to have no rate: not drawn, not missing.
+                values[(date_str, target)] = (
+                    None if value == self.SERIES_NOT_PROVIDED else float(value)
+                )
 
-        cached_batch = get_cache_batch(symbols, prefix=prefix)
-        missing = [s for s, v in cached_batch.items() if v is None]
+        return values, last_updated_at
+
+    async def _read_past_days(
+        self, base: str, targets: List[str], days: np.ndarray
+    ) -> dict:
+        """
+        {target: values aligned with days}, NaN where not stored and
+        SERIES_NOT_PROVIDED where upstream had no rate that day.
+        """
+        if self.archive is not None:
+            return self.archive.read(base, targets, days)
+
+        keys = [self._series_key(base, t) for t in targets]
+        series = await read_series_async(keys, int(days.min()), int(days.max()))
+
+        result = {}
+        for target, key in zip(targets, keys):
+            start_day, stored = series[key]
+            idx = days - start_day
+            in_range = (idx >= 0) & (idx < len(stored))
+            picked = np.full(len(days), np.nan)
+            picked[in_range] = stored[idx[in_range]]
+            result[target] = picked
+        return result
+
+    async def _read_day(
+        self, base: str, date_str: str, targets: List[str]
+    ) -> dict | None:
+        days = np.array([self._day_number(date_str)], dtype=np.int64)
+        stored = await self._read_past_days(base, targets, days)
+        if any(np.isnan(values[0]) for values in stored.values()):
+            return None
 
-        if not missing:
-            return cached_batch
+        return {
+            "meta": {"last_updated_at": None},
+            "data": {
+                t: {"value": float(values[0])}
+                for t, values in stored.items()
+                if values[0] != self.SERIES_NOT_PROVIDED
+            },
+        }
 
-        try:
+    def _day_targets(self, base: str) -> List[str]:
+        return [s for s in self.checker.all_symbols if s != base]
+
+    async def _fetch_day(self, base: str, date_str: str) -> dict:
+        # Every currency costs the same single call as a few, and stores the
+        # whole day for any later chart or backfill.
+        api_data = await self.client.historical(base_currency=base, date=date_str)
+        targets = self._day_targets(base)
+        day = self._day_number(date_str)
+        day_values = {
+            target: value
+            for target in targets
+            if (value := self._extract_value(api_data, target)) is not None
+        }
+        # Only an answer that carried rates says the others do not exist.
+        if day_values:
+            for target in targets:
+                day_values.setdefault(target, self.SERIES_NOT_PROVIDED)
+        if self.archive is not None:
+            self.archive.write(base, day, day_values)
+        else:
+            await asyncio.gather(
+                *(
+                    write_series_async(self._series_key(base, target), {day: value})
+                    for target, value in day_values.items()
+                )
+            )
+        return api_data
+
+    async def _get_day(self, base: str, date_str: str) -> dict:
+        """Every currency's rate against base on a past date, one fetch at a time."""
+        return await single_flight(
+            f"{self.CACHE_PREFIX_HISTORICAL}:{base}:{date_str}",
+            lambda: self._fetch_day(base, date_str),
+            recheck=lambda: self._read_day(base, date_str, self._day_targets(base)),
+        )
+
+    def _plan_dates(
+        self, start_date: datetime, end_date: datetime, step: int
+    ) -> List[str]:
+        date_list = []
+        curr = start_date
+        while curr <= end_date:
+            date_list.append(curr.strftime("%Y-%m-%d"))
+            curr += timedelta(days=step)
 
-            missing_known = [
-                s
-                for s in missing
-                if self.checker.check_which_type_of_currency(s) in ["FIAT", "CRYPTO"]
-            ]
-
-            if not missing_known:
-                return cached_batch
-
-            missing_crypto = [
-                s
-                for s in missing_known
-                if self.checker.check_which_type_of_currency(s) == "CRYPTO"
-            ]
-            missing_fiat = [
-                s
-                for s in missing_known
-                if self.checker.check_which_type_of_currency(s) == "FIAT"
-            ]
-
-            unknown_currencies = [
-                s
-                for s in missing
-                if self.checker.check_which_type_of_currency(s) == "UNKNOWN"
-            ]
+        end_date_str = end_date.strftime("%Y-%m-%d")
+        if not date_list or date_list[-1] != end_date_str:
+            date_list.append(end_date_str)
+        return date_list
 
-            if unknown_currencies:
-                print(
-                    f"Warning: Unknown currencies requested (will not query API): {unknown_currencies}"
+    async def backfill_history(
+        self,
+        base: str,
+        start_date: date,
+        end_date: date,
+        targets: list[str] | None = None,
+        batch_size: int = 30,
+        failed: list | None = None,
+    ) -> AsyncIterator[tuple[str, int]]:
+        """
+        Fetch every day in [start_date, end_date] that is not stored yet.
+
+        Days missing any of targets (every known symbol if omitted) are
+        fetched batch_size at a time, one upstream call per day that stores
+        every currency. Yields (date, number of targets stored) per fetched
+        day. A day whose fetch fails does not
+        stop the run; it is appended to failed instead.
+        """
+        base = base.upper()
+        symbol_types = self.checker.symbol_types
+        targets = [t.upper() for t in targets or self.checker.all_symbols]
+        targets = [t for t in targets if t in symbol_types and t != base]
+        today_str = datetime.now().strftime("%Y-%m-%d")
+
+        date_list = [
+            d
+            for d in self._plan_dates(
+                datetime.combine(start_date, datetime.min.time()),
+                datetime.combine(end_date, datetime.min.time()),
+                1,
+            )
+            if d < today_str
+        ]
+        if not date_list or not targets:
+            return
+
+        days = np.array([self._day_number(d) for d in date_list], dtype=np.int64)
+        stored = await self._read_past_days(base, targets, days)
+        missing = np.zeros(len(date_list), dtype=bool)
+        for values in stored.values():
+            missing |= np.isnan(values)
+        todo = [d for d, is_missing in zip(date_list, missing) if is_missing]
+
+        for i in range(0, len(todo), batch_size):
+            batch = todo[i : i + batch_size]
+            results = await asyncio.gather(
+                *(self._get_day(base, d) for d in batch),
+                return_exceptions=True,
+            )
+            for date_str, api_data in zip(batch, results):
+                if isinstance(api_data, Exception):
+                    print(f"API Error ({date_str}): {api_data}")
+                    if failed is not None:
+                        failed.append(date_str)
+                    continue
+                count = sum(
+                    self._extract_value(api_data, t) is not None for t in targets
                 )
+                yield date_str, count
 
-            new_rates = {}
+    async def iter_timeseries_data(
+        self,
+        base: str,
+        targets: list[str],
+        start_date: datetime,
+        end_date: datetime,
+        step: int = 1,
+        fetch_missing: bool = True,
+        failed: list | None = None,
+    ) -> AsyncIterator[tuple[str, dict, str | None]]:
+        """
+        Yield (target, series, last_updated_at) as soon as each target's
+        points are all available.
+
+        Targets that are fully cached (or unknown) come first; the rest
+        follow in the order their missing dates arrive from upstream. Today
+        always comes from the USD snapshot; with fetch_missing=False past
+        days not stored yet are left out of the series. Dates that could not
+        be fetched are appended to failed, so callers can tell a partial
+        series from a complete one.
+        """
+        base = base.upper()
+        targets = [t.upper() for t in targets]
+        date_list = self._plan_dates(start_date, end_date, step)
+        today_str = datetime.now().strftime("%Y-%m-%d")
 
-            if missing_crypto:
-                response = self.client.latest(
-                    currencies=missing_crypto, base_currency=base
-                )
-                raw_rates = response.get("data", {})
+        symbol_types = self.checker.symbol_types
+        known_targets = [t for t in targets if t in symbol_types]
 
-                for iso, val in self._normalize_rates(raw_rates, invert=False).items():
-                    if not is_crypto_base:
-                        new_rates[iso] = 1 / val if val != 0 else val
-                    else:
-                        new_rates[iso] = val
+        values, last_updated_at = await self._read_points(
+            base, date_list, known_targets, today_str, failed
+        )
 
-            if missing_fiat:
-                response = self.client.latest(
-                    currencies=missing_fiat, base_currency=base
-                )
-                raw_rates = response.get("data", {})
+        missing_by_date: Dict[str, List[str]] = {}
+        pending_dates: Dict[str, set] = {t: set() for t in known_targets}
+        for date_str in date_list:
+            if date_str == today_str or not fetch_missing:
+                continue
+            for target in known_targets:
+                if (date_str, target) not in values:
+                    missing_by_date.setdefault(date_str, []).append(target)
+                    pending_dates[target].add(date_str)
+
+        def series_for(target: str) -> dict:
+            is_symbol_crypto = symbol_types[target] == "CRYPTO"
+            series = {}
+            for date_str in date_list:
+                value = values.get((date_str, target))
+                if value is None:
+                    continue
+                if is_symbol_crypto and value != 0:
+                    value = 1 / value
+                series[date_str] = {"value": value}
+            return series
 
-                for iso, val in self._normalize_rates(raw_rates, invert=False).items():
-                    if is_crypto_base:
-                        new_rates[iso] = 1 / val if val != 0 else val
-                    else:
-                        new_rates[iso] = val
+        for target in targets:
+            if target not in pending_dates:
+                yield target, {}, last_updated_at
+            elif not pending_dates[target]:
+                yield target, series_for(target), last_updated_at
+
+        # One upstream call per missing date covers every target for that day,
+        # and the dates themselves are fetched concurrently.
+        tasks = {
+            asyncio.ensure_future(self._get_day(base, date_str)): (
+                date_str,
+                missing,
+            )
+            for date_str, missing in missing_by_date.items()
+        }
+        pending = set(tasks)
 
-            set_cache_batch(new_rates, prefix=prefix, expire_hours=cache_expire_hours)
-            cached_batch.update(new_rates)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    date_str, missing = tasks[task]
+                    try:
+                        api_data = task.result()
+                    except Exception as e:
+                        print(f"API Error: {e}")
+                        api_data = {}
+                        if failed is not None:
+                            failed.append(date_str)
+
+                    if not last_updated_at:
+                        last_updated_at = api_data.get("meta", {}).get(
+                            "last_updated_at"
+                        )
 
-        except Exception as e:
-            print(f"API Error: {e}")
+                    for target in missing:
+                        value = self._extract_value(api_data, target)
+                        if value is not None:
+                            values[(date_str, target)] = value
 
-        return cached_batch
+                        pending_dates[target].discard(date_str)
+                        if not pending_dates[target]:
+                            yield target, series_for(target), last_updated_at
+        finally:
+            for task in pending:
+                task.cancel()
 
-    async def get_timeseries_data(
+    async def get_aggregated_timeseries(
         self,
         base: str,
         targets: list[str],
         start_date: datetime,
         end_date: datetime,
-        step: int = 1,
+        how: str = "ohlc",
+        bucket_days: int = 7,
+        failed: list | None = None,
     ) -> Dict[str, Any]:
+        """
+        Daily series over [start_date, end_date] reduced to one point per
+        bucket_days, keyed by each bucket's first date (see aggregate.py).
+
+        Missing past days are only fetched from upstream for ranges up to
+        AGGREGATE_FETCH_DAYS; longer ranges aggregate what is already stored
+        (fill it with Currencies/Tools/backfill_history.py).
+        """
         base = base.upper()
         targets = [t.upper() for t in targets]
+        date_list = self._plan_dates(start_date, end_date, 1)
+        index = {d: i for i, d in enumerate(date_list)}
+        bucket_starts = date_list[::bucket_days]
 
-        date_list = []
-        curr = start_date
-        while curr <= end_date:
-            date_list.append(curr.strftime("%Y-%m-%d"))
-            curr += timedelta(days=step)
-
-        today_str = datetime.now().strftime("%Y-%m-%d")
-
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        if not date_list or date_list[-1] != end_date_str:
-            date_list.append(end_date_str)
         combined_results = {t: {} for t in targets}
         last_updated_at = None
-
-        for target in targets:
-
-            ctype = self.checker.check_which_type_of_currency(target)
-            if ctype == "UNKNOWN":
+        stored_days = 0
+
+        async for target, series, updated_at in self.iter_timeseries_data(
+            base,
+            targets,
+            start_date,
+            end_date,
+            fetch_missing=len(date_list) <= self.AGGREGATE_FETCH_DAYS,
+            failed=failed,
+        ):
+            last_updated_at = updated_at or last_updated_at
+            if not series:
                 continue
+            daily = np.full(len(date_list), np.nan)
+            for date_str, point in series.items():
+                daily[index[date_str]] = point["value"]
+            stored_days += len(series)
+
+            buckets = bucket_aggregate(daily, bucket_days)
+            points = bucket_points(buckets, how)
+            combined_results[target] = {
+                bucket_starts[i]: points[i] for i in np.flatnonzero(buckets["count"])
+            }
+
+        if not last_updated_at:
+            dates = [d for series in combined_results.values() for d in series]
+            if dates:
+                last_updated_at = f"{max(dates)}T23:59:59Z"
 
-            is_symbol_crypto = (
-                self.checker.check_which_type_of_currency(target) == "CRYPTO"
-            )
-
-            cache_keys = {}
-            for date_str in date_list:
-                if date_str == today_str:
-                    key = f"{self.CACHE_PREFIX_LATEST}:{base}:{target}"
-                else:
-                    key = f"{self.CACHE_PREFIX_HISTORICAL}:{date_str}:{base}:{target}"
-                cache_keys[date_str] = key
-
-            cached_batch = get_cache_batch(list(cache_keys.values()), prefix="")
+        return {
+            "meta": {
+                "base": base,
+                "targets": targets,
+                "aggregation": how,
+                "bucket_days": bucket_days,
+                "coverage": round(
+                    stored_days / max(len(date_list) * len(targets), 1), 4
+                ),
+                "last_updated_at": last_updated_at or "Unknown",
+            },
+            "data": combined_results,
+        }
 
-            for date_str in date_list:
-                key = cache_keys[date_str]
-                cached_data = cached_batch.get(key)
+    async def get_timeseries_data(
+        self,
+        base: str,
+        targets: list[str],
+        start_date: datetime,
+        end_date: datetime,
+        step: int = 1,
+    ) -> Dict[str, Any]:
+        base = base.upper()
+        targets = [t.upper() for t in targets]
 
-                found = False
-                if cached_data:
-                    try:
-                        data_dict = (
-                            json.loads(cached_data)
-                            if isinstance(cached_data, str)
-                            else cached_data
-                        )
-                        if isinstance(data_dict, dict) and "data" in data_dict:
-                            if target in data_dict["data"]:
-                                value = data_dict["data"][target]["value"]
-                                if (
-                                    is_symbol_crypto
-                                    and isinstance(value, (int, float))
-                                    and value != 0
-                                ):
-                                    value = 1 / value
-                                combined_results[target][date_str] = {"value": value}
-                                if not last_updated_at and "meta" in data_dict:
-                                    last_updated_at = data_dict["meta"].get(
-                                        "last_updated_at"
-                                    )
-                                found = True
-                    except Exception:
-                        pass
-
-                if found:
-                    continue
+        combined_results = {t: {} for t in targets}
+        last_updated_at = None
 
-                try:
-                    if date_str == today_str:
-                        api_data = self.client.latest(
-                            base_currency=base, currencies=[target]
-                        )
-                        set_cache(
-                            key,
-                            api_data,
-                            expire_hours=1,
-                        )
-                    else:
-                        api_data = self.client.historical(
-                            base_currency=base, currencies=[target], date=date_str
-                        )
-                        set_cache(
-                            key,
-                            api_data,
-                            expire_hours=None,
-                        )
+        async for target, series, updated_at in self.iter_timeseries_data(
+            base, targets, start_date, end_date, step
+        ):
+            combined_results[target] = series
+            last_updated_at = updated_at or last_updated_at
 
-                    if "data" in api_data and target in api_data["data"]:
-                        value = api_data["data"][target]["value"]
-                        if (
-                            is_symbol_crypto
-                            and isinstance(value, (int, float))
-                            and value != 0
-                        ):
-                            value = 1 / value
-                        combined_results[target][date_str] = {"value": value}
-                        if not last_updated_at and "meta" in api_data:
-                            last_updated_at = api_data["meta"].get("last_updated_at")
-                except Exception as e:
-                    continue
+        if not last_updated_at:
+            dates = [d for series in combined_results.values() for d in series]
+            if dates:
+                last_updated_at = f"{max(dates)}T23:59:59Z"
 
         return {
             "meta": {
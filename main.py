@@ -1,18 +1,29 @@
+import asyncio
+import hashlib
+import math
 import os
-from datetime import datetime, timedelta
+import struct
+import time
+from datetime import datetime, timedelta, timezone
 
 import dotenv
-from flask import Flask, Response, jsonify, request
+import numpy as np
+from flask import Flask, Response, g, jsonify, request
 
 import renderer
-from cache import check_rate_limit
+from aggregate import AGGREGATIONS
+from cache import check_rate_limit, matrix_cache, render_cache
 from currency import Currency
+from metrics import REQUEST_SECONDS, STAGE_SECONDS, render_metrics, stage_timer
 
 dotenv.load_dotenv()
 
 app = Flask(__name__)
 currency_service = Currency()
 
+if os.getenv("BACKGROUND_REFRESH", "true").lower() == "true":
+    currency_service.start_background_refresh()
+
 
 def is_curl_client():
     user_agent = request.headers.get("User-Agent", "").lower()
@@ -27,6 +38,24 @@ def parse_path_args(arg_str):
     ]
 
 
+def get_client_width():
+    """
+    Terminal width from ?width= (or ?cols=) or a COLUMNS-style header,
+    floored to a renderer width bucket.
+    """
+    raw_width = (
+        request.args.get("width")
+        or request.args.get("cols")
+        or request.headers.get("X-Terminal-Width")
+        or request.headers.get("Columns")
+    )
+    try:
+        width = int(raw_width) if raw_width else renderer.get_terminal_width()
+    except ValueError:
+        width = renderer.get_terminal_width()
+    return renderer.bucket_width(width)
+
+
 def get_client_ip():
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
@@ -34,15 +63,210 @@ def get_client_ip():
     return request.remote_addr
 
 
+RENDER_CACHE_TTL_SECONDS = 3600
+
+
+def _etag_for(cache_key: str) -> str:
+    return f'"{hashlib.sha1(cache_key.encode()).hexdigest()}"'
+
+
+async def cached_text_response(
+    cache_key: str | None,
+    render,
+    mimetype="text/plain",
+    is_complete=None,
+    cache=render_cache,
+):
+    """
+    Serve rendered terminal output from the render cache.
+
+    cache_key must capture everything the output depends on, including the
+    data version, so it doubles as the ETag and a matching If-None-Match is
+    answered with 304 before anything is fetched or rendered. render() may
+    return text or bytes. Output is only cached (and given an ETag) when
+    there is a cache_key and is_complete(), if given, holds after rendering.
+    Large bodies can be kept in a cache of their own.
+    """
+    if cache_key is not None:
+        etag = _etag_for(cache_key)
+        if request.if_none_match.contains(etag.strip('"')):
+            return Response(status=304, headers={"ETag": etag})
+
+        body = cache.get(cache_key)
+        if body is not None:
+            return Response(body, mimetype=mimetype, headers={"ETag": etag})
+
+    body = await render()
+    if isinstance(body, str):
+        body = body.encode()
+    if cache_key is None or (is_complete is not None and not is_complete()):
+        return Response(body, mimetype=mimetype)
+
+    cache.set(cache_key, body, ttl_seconds=RENDER_CACHE_TTL_SECONDS)
+    return Response(body, mimetype=mimetype, headers={"ETag": etag})
+
+
+async def cached_stream_response(cache_key: str | None, stream, is_complete=None):
+    """
+    Like cached_text_response, but on a cache miss the body is streamed
+    chunk by chunk from stream() and cached once it completes. Headers go
+    out before the body is known to be complete, so only cache hits carry
+    an ETag.
+    """
+    if cache_key is not None:
+        etag = _etag_for(cache_key)
+        if request.if_none_match.contains(etag.strip('"')):
+            return Response(status=304, headers={"ETag": etag})
+
+        body = render_cache.get(cache_key)
+        if body is not None:
+            return Response(body, mimetype="text/plain", headers={"ETag": etag})
+
+    def generate():
+        parts = []
+        try:
+            for chunk in stream():
+                data = chunk.encode()
+                parts.append(data)
+                yield data
+        except Exception as e:
+            yield f"{renderer.Colors.RED}Error: {str(e)}{renderer.Colors.RESET}\n".encode()
+            return
+
+        if cache_key is None or (is_complete is not None and not is_complete()):
+            return
+        render_cache.set(
+            cache_key, b"".join(parts), ttl_seconds=RENDER_CACHE_TTL_SECONDS
+        )
+
+    return Response(generate(), mimetype="text/plain")
+
+
+async def history_data_version() -> str | None:
+    """
+    Snapshot version for history render cache keys, or None when no snapshot
+    can be read. Charts can still be drawn from stored days then, just not
+    cached.
+    """
+    try:
+        return await on_io_loop(currency_service.get_data_version())
+    except Exception as e:
+        print(f"API Error: {e}")
+        return None
+
+
+async def on_io_loop(coro):
+    """
+    Await coro on the worker's long-lived event loop.
+
+    Flask runs each async view on a fresh event loop, while the upstream and
+    Redis connection pools (and the upstream concurrency cap) are bound to
+    the loop that created them. Doing all I/O on one loop per worker keeps a
+    single pool for the life of the process.
+    """
+    return await asyncio.wrap_future(currency_service.refresher.run(coro))
+
+
+def iterate_in_loop(async_iterable):
+    """
+    Drive an async iterator from a plain generator on the worker's I/O loop.
+
+    Streamed bodies are consumed by the WSGI server after the view, and the
+    event loop Flask ran it on, have finished.
+    """
+    run = currency_service.refresher.run
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield run(iterator.__anext__()).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        run(iterator.aclose()).result()
+
+
+def render_stream(render, items):
+    """
+    Yield the chunks of render(items), observing the render stage with the
+    time spent producing them. Time spent waiting on items, and on the
+    client between chunks, is left out.
+    """
+    waited = busy = 0.0
+
+    def timed(iterator):
+        nonlocal waited
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - started
+            yield item
+
+    chunks = render(timed(iter(items)))
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter() - started
+            yield chunk
+    finally:
+        chunks.close()
+    STAGE_SECONDS.observe(busy - waited, stage="render")
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+@app.after_request
+def observe_request_duration(response):
+    started_at = g.pop("request_started_at", None)
+    if started_at is None:
+        return response
+
+    route = request.endpoint or "unmatched"
+    status = response.status_code
+
+    def observe():
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started_at, route=route, status=status
+        )
+
+    # Streamed bodies are produced after this hook returns, so their time
+    # is taken once the server has sent the whole body.
+    if response.is_streamed:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+
+@app.route("/metrics")
+def get_metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
 def check_request_rate_limit():
     client_ip = get_client_ip() or "unknown"
 
-    rate_limit = check_rate_limit(
-        ip_address=client_ip,
-        max_requests=20,
-        window_minutes=1,
-        block_duration_minutes=60,
-    )
+    with stage_timer("rate_limit"):
+        rate_limit = check_rate_limit(
+            ip_address=client_ip,
+            max_requests=20,
+            window_minutes=1,
+            block_duration_minutes=60,
+            algorithm=os.getenv("RATE_LIMIT_ALGORITHM", "fixed_window"),
+            local_batch_size=int(os.getenv("RATE_LIMIT_LOCAL_BATCH", 1)),
+        )
 
     if not rate_limit["allowed"]:
         if is_curl_client():
@@ -55,6 +279,15 @@ def check_request_rate_limit():
     return None
 
 
+def unknown_base_response(base):
+    message = f"Unknown base currency {base}"
+    if is_curl_client():
+        return Response(
+            f"{renderer.Colors.RED}{message}{renderer.Colors.RESET}\n", status=400
+        )
+    return jsonify({"error": message}), 400
+
+
 @app.route("/", defaults={"query": None})
 @app.route("/<path:query>")
 async def get_rates(query):
@@ -65,8 +298,14 @@ async def get_rates(query):
 
     if query is None or query.lower() in ["usage", "help", "info"]:
         if is_curl_client():
-            output = renderer.render_usage()
-            return Response(output, mimetype="text/plain")
+
+            width = get_client_width()
+
+            async def render_usage():
+                with stage_timer("render"):
+                    return renderer.render_usage(width)
+
+            return await cached_text_response(f"usage|{width}", render_usage)
         return jsonify(
             {
                 "message": "Use /usage endpoint to view help",
@@ -76,6 +315,11 @@ async def get_rates(query):
                     "current_rates_with_targets": "GET /{base}/{targets}",
                     "historical": "GET /last/{base}/{target}/{time}",
                     "historical_with_step": "GET /last/{base}/{target}/{time}/{step}",
+                    "historical_aggregated": "GET /last/{base}/{target}/{time}?agg=ohlc|mean|minmax&points=120",
+                    "convert": "GET /convert/{amount}/{from}/{to}",
+                    "convert_batch": "POST /convert",
+                    "bulk": "POST /bulk",
+                    "matrix": "GET /matrix/{symbols}?format=json|f32|f64",
                 },
             }
         )
@@ -92,15 +336,159 @@ async def get_rates(query):
         base_currency = "USD"
         requested_symbols = parse_path_args(parts[0])
 
+    if base_currency not in currency_service.checker.symbol_types:
+        return unknown_base_response(base_currency)
+
     try:
-        data = await currency_service.get_rates(
-            symbols=requested_symbols, base=base_currency
+        if is_curl_client():
+            width = get_client_width()
+
+            async def render_rates():
+                data = await on_io_loop(
+                    currency_service.get_rates(
+                        symbols=requested_symbols, base=base_currency
+                    )
+                )
+                with stage_timer("render"):
+                    return renderer.render_table(data, base_currency, width)
+
+            version = await on_io_loop(currency_service.get_data_version())
+            cache_key = "|".join(
+                [
+                    "rates",
+                    base_currency,
+                    ",".join(requested_symbols or []),
+                    str(width),
+                    version,
+                ]
+            )
+            return await cached_text_response(cache_key, render_rates)
+
+        data = await on_io_loop(
+            currency_service.get_rates(symbols=requested_symbols, base=base_currency)
         )
 
+        return jsonify({"data": data})
+
+    except Exception as e:
         if is_curl_client():
-            output = renderer.render_table(data, base_currency)
-            return Response(output, mimetype="text/plain")
+            return Response(
+                f"{renderer.Colors.RED}Error: {str(e)}{renderer.Colors.RESET}\n",
+                status=500,
+            )
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_BULK_REQUESTS = 100
+
+
+@app.route("/bulk", methods=["POST"])
+async def get_bulk_rates():
+    """
+    Rates for many bases in one round trip.
+
+    Body: {"requests": [{"base": "USD", "targets": ["EUR", "GBP"]}, ...]}.
+    targets may also be a "EUR,GBP" string, or omitted for every currency.
+    """
+    rate_limit_response = check_request_rate_limit()
+    if rate_limit_response:
+        return rate_limit_response
 
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("requests")
+    if not isinstance(items, list) or not items:
+        return (
+            jsonify(
+                {
+                    "error": 'Invalid body. Use {"requests": [{"base": "USD", "targets": ["EUR"]}]}'
+                }
+            ),
+            400,
+        )
+    if len(items) > MAX_BULK_REQUESTS:
+        return (
+            jsonify(
+                {
+                    "error": f"Too many requests in batch ({len(items)}), maximum is {MAX_BULK_REQUESTS}"
+                }
+            ),
+            400,
+        )
+
+    symbol_types = currency_service.checker.symbol_types
+    pairs = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("base"), str):
+            return jsonify({"error": "Each request needs a base currency"}), 400
+        base = item["base"].strip().upper()
+        if base not in symbol_types:
+            return jsonify({"error": f"Unknown base currency {base}"}), 400
+        targets = item.get("targets")
+        if isinstance(targets, str):
+            targets = parse_path_args(targets)
+        elif targets is not None and not (
+            isinstance(targets, list) and all(isinstance(t, str) for t in targets)
+        ):
+            return (
+                jsonify({"error": "targets must be a list of strings or a string"}),
+                400,
+            )
+        pairs.append((base, targets))
+
+    try:
+        data = await on_io_loop(currency_service.get_bulk_rates(pairs))
+        return jsonify({"data": data})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_CONVERSIONS = 10000
+
+
+@app.route("/convert/<path:query>")
+async def get_conversion(query):
+    """Convert an amount: /convert/{amount}/{from}/{to}, to may list several."""
+    rate_limit_response = check_request_rate_limit()
+    if rate_limit_response:
+        return rate_limit_response
+
+    parts = query.split("/")
+    if len(parts) != 3:
+        return (
+            jsonify({"error": "Invalid format. Use /convert/amount/from/to"}),
+            400,
+        )
+    try:
+        amount = float(parts[0])
+    except ValueError:
+        return jsonify({"error": "Invalid amount"}), 400
+    if not math.isfinite(amount):
+        return jsonify({"error": "Invalid amount"}), 400
+
+    source = parts[1].upper()
+    rows = [(amount, source, target) for target in parse_path_args(parts[2])]
+    if not source or not rows:
+        return (
+            jsonify({"error": "Invalid format. Use /convert/amount/from/to"}),
+            400,
+        )
+
+    try:
+        if is_curl_client():
+            width = get_client_width()
+
+            async def render_conversion():
+                data = await on_io_loop(currency_service.convert(rows))
+                with stage_timer("render"):
+                    return renderer.render_conversions(data, width)
+
+            version = await on_io_loop(currency_service.get_data_version())
+            cache_key = "|".join(
+                ["convert", repr(amount), source, parts[2].upper(), str(width), version]
+            )
+            return await cached_text_response(cache_key, render_conversion)
+
+        data = await on_io_loop(currency_service.convert(rows))
         return jsonify({"data": data})
 
     except Exception as e:
@@ -112,6 +500,182 @@ async def get_rates(query):
         return jsonify({"error": str(e)}), 500
 
 
+def is_finite_number(value):
+    # JSON bodies may carry NaN/Infinity, and ints too large for a float.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+
+@app.route("/convert", methods=["POST"])
+async def post_conversions():
+    """
+    Batch conversion.
+
+    Body: {"conversions": [{"amount": 10, "from": "USD", "to": "EUR"}, ...]};
+    rows may also be given as [amount, from, to] lists.
+    """
+    rate_limit_response = check_request_rate_limit()
+    if rate_limit_response:
+        return rate_limit_response
+
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("conversions")
+    if not isinstance(items, list) or not items:
+        return (
+            jsonify(
+                {
+                    "error": 'Invalid body. Use {"conversions": [{"amount": 10, "from": "USD", "to": "EUR"}]}'
+                }
+            ),
+            400,
+        )
+    if len(items) > MAX_CONVERSIONS:
+        return (
+            jsonify(
+                {
+                    "error": f"Too many conversions in batch ({len(items)}), maximum is {MAX_CONVERSIONS}"
+                }
+            ),
+            400,
+        )
+
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            item = (item.get("amount"), item.get("from"), item.get("to"))
+        if (
+            not isinstance(item, (list, tuple))
+            or len(item) != 3
+            or not is_finite_number(item[0])
+            or not isinstance(item[1], str)
+            or not isinstance(item[2], str)
+        ):
+            return (
+                jsonify(
+                    {"error": "Each conversion needs a numeric amount, from and to"}
+                ),
+                400,
+            )
+        rows.append(tuple(item))
+
+    try:
+        data = await on_io_loop(currency_service.convert(rows))
+        return jsonify({"data": data})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_MATRIX_SYMBOLS = 500
+
+# Binary rate matrix layout (little-endian):
+#   magic "CRMX", version u8, dtype u8 (b"f" float32 / b"d" float64),
+#   reserved u16, symbol count N u32, snapshot fetched_at f64,
+#   N symbols as 12-byte NUL-padded ASCII, then N*N row-major floats
+#   (row = from, column = to; NaN where no rate is available).
+MATRIX_HEADER = struct.Struct("<4sBcHId")
+MATRIX_FORMAT_VERSION = 1
+MATRIX_DTYPES = {"f32": ("f", np.dtype("<f4")), "f64": ("d", np.dtype("<f8"))}
+
+
+def encode_rate_matrix(symbols, matrix, fetched_at, fmt):
+    code, dtype = MATRIX_DTYPES[fmt]
+    header = MATRIX_HEADER.pack(
+        b"CRMX", MATRIX_FORMAT_VERSION, code.encode(), 0, len(symbols), fetched_at
+    )
+    names = np.array([s.encode() for s in symbols], dtype="S12")
+    return header + names.tobytes() + matrix.astype(dtype).tobytes()
+
+
+@app.route("/matrix", defaults={"query": None})
+@app.route("/matrix/<path:query>")
+async def get_rate_matrix(query):
+    """
+    Full cross-rate matrix for a symbol set: /matrix/USD,EUR,BTC.
+
+    ?format=json (default), f32 or f64; the binary forms use the layout
+    described above MATRIX_HEADER.
+    """
+    rate_limit_response = check_request_rate_limit()
+    if rate_limit_response:
+        return rate_limit_response
+
+    symbols = parse_path_args(query)
+    fmt = request.args.get("format", "json").lower()
+    if fmt != "json" and fmt not in MATRIX_DTYPES:
+        return jsonify({"error": "Invalid format. Use json, f32 or f64"}), 400
+    if len(symbols) > MAX_MATRIX_SYMBOLS:
+        return (
+            jsonify(
+                {
+                    "error": f"Requested symbols ({len(symbols)}) exceeds maximum ({MAX_MATRIX_SYMBOLS})"
+                }
+            ),
+            400,
+        )
+    unknown_currencies = currency_service.checker.partition(symbols)["UNKNOWN"]
+    if unknown_currencies:
+        return (
+            jsonify({"error": f"Unknown currencies: {', '.join(unknown_currencies)}"}),
+            400,
+        )
+
+    try:
+        symbols, matrix, fetched_at = await on_io_loop(
+            currency_service.get_rate_matrix(symbols)
+        )
+        if len(symbols) > MAX_MATRIX_SYMBOLS:
+            return (
+                jsonify(
+                    {
+                        "error": f"Matrix of all currencies exceeds maximum ({MAX_MATRIX_SYMBOLS}). Request a symbol set"
+                    }
+                ),
+                400,
+            )
+
+        cache_key = "|".join(["matrix", ",".join(symbols), fmt, f"{fetched_at:.0f}"])
+
+        async def render_matrix():
+            if fmt in MATRIX_DTYPES:
+                return encode_rate_matrix(symbols, matrix, fetched_at, fmt)
+            rows = [
+                [None if math.isnan(value) else value for value in row]
+                for row in matrix.tolist()
+            ]
+            return app.json.dumps(
+                {
+                    "symbols": symbols,
+                    "matrix": rows,
+                    "last_updated_at": datetime.fromtimestamp(
+                        fetched_at, timezone.utc
+                    ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+            )
+
+        return await cached_text_response(
+            cache_key,
+            render_matrix,
+            mimetype=(
+                "application/octet-stream"
+                if fmt in MATRIX_DTYPES
+                else "application/json"
+            ),
+            cache=matrix_cache,
+        )
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_AGGREGATE_DAYS = 7300
+MAX_AGGREGATE_POINTS = 365
+DEFAULT_AGGREGATE_POINTS = 120
+
+
 @app.route("/hist/<path:query>")
 @app.route("/historical/<path:query>")
 @app.route("/history/<path:query>")
@@ -137,6 +701,8 @@ async def get_historical_rates(query):
     base = parts[0].upper()
     targets = parts[1].replace(",", "+").upper().split("+")
     time_str = parts[2].lower()
+    if base not in currency_service.checker.symbol_types:
+        return unknown_base_response(base)
 
     days = 0
     if time_str.endswith("d"):
@@ -159,6 +725,7 @@ async def get_historical_rates(query):
     elif days > 30:
         step = 1
 
+    step_given = False
     if len(parts) > 3:
         step_str = parts[3].lower()
         try:
@@ -173,9 +740,16 @@ async def get_historical_rates(query):
 
             if step <= 0:
                 return jsonify({"error": "Step must be greater than 0"}), 400
+            step_given = True
         except (ValueError, IndexError):
             pass
 
+    aggregation = request.args.get("agg", "").lower()
+    if aggregation:
+        return await get_aggregated_history(
+            base, targets, days, step if step_given else None, aggregation
+        )
+
     max_data_points = 365
 
     estimated_points = days // step if step > 0 else days
@@ -193,21 +767,161 @@ async def get_historical_rates(query):
     start_dt = end_dt - timedelta(days=days)
 
     try:
-        data = await currency_service.get_timeseries_data(
-            base=base,
-            targets=targets,
-            start_date=start_dt,
-            end_date=end_dt,
-            step=step,
+        if is_curl_client():
+            width = get_client_width()
+
+            failed = []
+
+            def stream_history():
+                series_items = iterate_in_loop(
+                    currency_service.iter_timeseries_data(
+                        base=base,
+                        targets=targets,
+                        start_date=start_dt,
+                        end_date=end_dt,
+                        step=step,
+                        failed=failed,
+                    )
+                )
+                return render_stream(
+                    lambda items: renderer.stream_graph(
+                        items,
+                        start_dt.strftime("%Y-%m-%d"),
+                        end_dt.strftime("%Y-%m-%d"),
+                        width,
+                        targets=targets,
+                    ),
+                    ((target, series) for target, series, _ in series_items),
+                )
+
+            version = await history_data_version()
+            cache_key = version and "|".join(
+                [
+                    "history",
+                    base,
+                    ",".join(targets),
+                    end_dt.strftime("%Y-%m-%d"),
+                    str(days),
+                    str(step),
+                    str(width),
+                    version,
+                ]
+            )
+            return await cached_stream_response(
+                cache_key, stream_history, is_complete=lambda: not failed
+            )
+
+        data = await on_io_loop(
+            currency_service.get_timeseries_data(
+                base=base,
+                targets=targets,
+                start_date=start_dt,
+                end_date=end_dt,
+                step=step,
+            )
+        )
+
+        return jsonify(data)
+
+    except Exception as e:
+        if is_curl_client():
+            return Response(f"Error: {str(e)}\n", status=500)
+        return jsonify({"error": str(e)}), 500
+
+
+async def get_aggregated_history(base, targets, days, bucket_days, aggregation):
+    """
+    History reduced server-side to at most ?points= buckets (or one per
+    explicit step) of ohlc, mean or minmax over every stored day.
+    """
+    if aggregation not in AGGREGATIONS:
+        return (
+            jsonify({"error": f"Invalid aggregation. Use {', '.join(AGGREGATIONS)}"}),
+            400,
+        )
+    if days > MAX_AGGREGATE_DAYS:
+        return (
+            jsonify(
+                {
+                    "error": f"Requested range ({days} days) exceeds maximum ({MAX_AGGREGATE_DAYS}) for aggregated history"
+                }
+            ),
+            400,
+        )
+
+    try:
+        points = int(request.args.get("points", DEFAULT_AGGREGATE_POINTS))
+    except ValueError:
+        return jsonify({"error": "Invalid points value"}), 400
+    if not 0 < points <= MAX_AGGREGATE_POINTS:
+        return (
+            jsonify({"error": f"Points must be between 1 and {MAX_AGGREGATE_POINTS}"}),
+            400,
         )
+    if bucket_days is None:
+        bucket_days = max(1, math.ceil((days + 1) / points))
+    num_buckets = math.ceil((days + 1) / bucket_days)
+    if num_buckets > MAX_AGGREGATE_POINTS:
+        return (
+            jsonify(
+                {
+                    "error": f"Requested buckets ({num_buckets}) exceeds maximum ({MAX_AGGREGATE_POINTS}). Increase step value or reduce time range"
+                }
+            ),
+            400,
+        )
+
+    end_dt = datetime.now()
+    start_dt = end_dt - timedelta(days=days)
 
+    failed = []
+
+    async def load():
+        return await on_io_loop(
+            currency_service.get_aggregated_timeseries(
+                base=base,
+                targets=targets,
+                start_date=start_dt,
+                end_date=end_dt,
+                how=aggregation,
+                bucket_days=bucket_days,
+                failed=failed,
+            )
+        )
+
+    try:
         if is_curl_client():
-            output = renderer.render_graph(
-                data, start_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d")
+            width = get_client_width()
+
+            async def render_history():
+                data = await load()
+                with stage_timer("render"):
+                    return renderer.render_graph(
+                        data,
+                        start_dt.strftime("%Y-%m-%d"),
+                        end_dt.strftime("%Y-%m-%d"),
+                        width,
+                    )
+
+            version = await history_data_version()
+            cache_key = version and "|".join(
+                [
+                    "history",
+                    base,
+                    ",".join(targets),
+                    end_dt.strftime("%Y-%m-%d"),
+                    str(days),
+                    aggregation,
+                    str(bucket_days),
+                    str(width),
+                    version,
+                ]
+            )
+            return await cached_text_response(
+                cache_key, render_history, is_complete=lambda: not failed
             )
-            return Response(output, mimetype="text/plain")
 
-        return jsonify(data)
+        return jsonify(await load())
 
     except Exception as e:
         if is_curl_client():
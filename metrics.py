@@ -0,0 +1,217 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable
+
+# Values are kept per process; with several gunicorn workers each one
+# reports its own series, so scrape them individually or aggregate by
+# instance.
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_metrics: list = []
+_collectors: list[Callable[[], None]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    TYPE = ""
+
+    def __init__(self, name: str, description: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> list[str]: ...
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, ([*s[0]], s[1], s[2])) for k, s in self._values.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def register_collector(collect: Callable[[], None]) -> None:
+    """Run collect() before every scrape, to refresh gauges read from elsewhere."""
+    _collectors.append(collect)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    for collect in _collectors:
+        collect()
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+REQUEST_SECONDS = Histogram(
+    "crrcy_request_duration_seconds",
+    "Time spent in a route until its response is returned.",
+    ("route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "crrcy_stage_duration_seconds",
+    "Time spent in one stage of handling a request.",
+    ("stage",),
+)
+CACHE_REQUESTS = Counter(
+    "crrcy_cache_requests_total",
+    "Cache lookups by layer, key prefix and outcome.",
+    ("layer", "prefix", "result"),
+)
+LOCAL_CACHE_ENTRIES = Gauge(
+    "crrcy_local_cache_entries",
+    "Entries currently held by an in-process cache.",
+    ("cache",),
+)
+UPSTREAM_REQUESTS = Counter(
+    "crrcy_upstream_requests_total",
+    "Calls to currencyapi by endpoint and HTTP status.",
+    ("endpoint", "status"),
+)
+UPSTREAM_QUOTA_REMAINING = Gauge(
+    "crrcy_upstream_quota_remaining",
+    "Monthly currencyapi quota left, as last reported by the API.",
+)
+UPSTREAM_QUOTA_LIMIT = Gauge(
+    "crrcy_upstream_quota_limit",
+    "Monthly currencyapi quota, as last reported by the API.",
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the wall time of the enclosed block under STAGE_SECONDS."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def key_prefix(key) -> str:
+    """Leading namespace of a cache key: "series:USD:EUR" -> "series"."""
+    return str(key).split(":", 1)[0].split("|", 1)[0]
+
+
+def count_cache_lookups(layer: str, keys: list, values: list) -> None:
+    """Count hits (non-None values) and misses per key prefix."""
+    tally: dict[tuple[str, str], int] = {}
+    for key, value in zip(keys, values):
+        labels = (key_prefix(key), "hit" if value is not None else "miss")
+        tally[labels] = tally.get(labels, 0) + 1
+    for (prefix, result), amount in tally.items():
+        CACHE_REQUESTS.inc(amount, layer=layer, prefix=prefix, result=result)
@@ -0,0 +1,69 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Coroutine
+
+
+class BackgroundRefresher:
+    """
+    Runs cache refreshes on a long-lived event loop in a daemon thread.
+
+    Flask cancels whatever is left on a request's event loop once the view
+    returns, so work that must outlive the request is handed off here.
+    Submissions are deduplicated by key while one is still running. The
+    same loop also runs the request I/O (see run()), so the connection
+    pools bound to it live as long as the worker.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._pending: set[str] = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="crrcy-refresher",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Run coro on the long-lived loop; the future can be awaited from any loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def submit(self, key: str, job: Callable[[], Awaitable]) -> bool:
+        """Schedule job() unless one for the same key is already pending."""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+
+        async def run():
+            try:
+                await job()
+            except Exception as e:
+                print(f"Refresh Error ({key}): {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        asyncio.run_coroutine_threadsafe(run(), self._ensure_loop())
+        return True
+
+    def schedule(
+        self, key: str, job: Callable[[], Awaitable], interval_seconds: float
+    ) -> None:
+        """Run job() now and then every interval_seconds."""
+
+        async def tick():
+            while True:
+                self.submit(key, job)
+                await asyncio.sleep(interval_seconds)
+
+        asyncio.run_coroutine_threadsafe(tick(), self._ensure_loop())
@@ -1,7 +1,10 @@
+import functools
 import math
 import shutil
 from datetime import datetime, timedelta
-from typing import Any, Union, cast
+from typing import Any
+
+import numpy as np
 
 
 class Colors:
@@ -27,18 +30,30 @@ class Colors:
     BRIGHT_RED = "\033[91m"
 
 
+# Client widths are floored to one of these so rendered output can be cached
+# and reused across requests.
+WIDTH_BUCKETS = (40, 60, 80, 100, 120, 140, 160, 200)
+
+
 def get_terminal_width():
     return shutil.get_terminal_size((80, 20)).columns
 
 
+def bucket_width(width: int) -> int:
+    """Floor a terminal width to the nearest bucket that still fits."""
+    fitting = [b for b in WIDTH_BUCKETS if b <= width]
+    return fitting[-1] if fitting else WIDTH_BUCKETS[0]
+
+
 def center_text(text, width=None):
     if width is None:
         width = get_terminal_width()
     return text.center(width)
 
 
-def render_header(title, subtitle=None):
-    width = get_terminal_width()
+def render_header(title, subtitle=None, width=None):
+    if width is None:
+        width = get_terminal_width()
     output = []
     output.append(f"{Colors.BOLD}{Colors.BRIGHT_BLUE}{'=' * width}{Colors.RESET}")
     output.append(
@@ -54,16 +69,18 @@ def render_footer():
     print("")
 
 
-def render_table(data: dict, base: str):
+def render_table(data: dict, base: str, width=None):
+    if width is None:
+        width = get_terminal_width()
 
     lines = []
-    lines.append(render_header("CURRENCY RATES", f"Base: {base.upper()}"))
+    lines.append(render_header("CURRENCY RATES", f"Base: {base.upper()}", width))
     lines.append("")
 
     header = (
         f"{Colors.BOLD}{Colors.UNDERLINE}{'CURRENCY':<10} {'RATE':>15}{Colors.RESET}"
     )
-    lines.append(center_text(header))
+    lines.append(center_text(header, width))
 
     sorted_data = sorted(data.items())
 
@@ -85,22 +102,54 @@ def render_table(data: dict, base: str):
         row = (
             f"{color}{iso:<10}{Colors.RESET} {Colors.WHITE}{rate_str:>15}{Colors.RESET}"
         )
-        lines.append(center_text(row))
+        lines.append(center_text(row, width))
+
+    lines.append("")
+    lines.append(f"{Colors.DIM}crrcy.sh{Colors.RESET}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_amount(value) -> str:
+    if value is None:
+        return "N/A"
+    if abs(value) >= 1 or value == 0:
+        return f"{value:,.2f}"
+    return f"{value:.8g}"
+
+
+def render_conversions(rows: list, width=None):
+    if width is None:
+        width = get_terminal_width()
+
+    lines = []
+    lines.append(render_header("CONVERSION", None, width))
+    lines.append("")
+
+    for row in rows:
+        line = (
+            f"{Colors.WHITE}{_format_amount(row['amount'])} {Colors.CYAN}{row['from']}{Colors.RESET}"
+            f" = {Colors.BOLD}{Colors.GREEN}{_format_amount(row['result'])} {row['to']}{Colors.RESET}"
+        )
+        lines.append(center_text(line, width))
 
     lines.append("")
     lines.append(f"{Colors.DIM}crrcy.sh{Colors.RESET}")
     return "\n".join(lines) + "\n"
 
 
-def render_usage():
-    width = get_terminal_width()
+def render_usage(width=None):
+    if width is None:
+        width = get_terminal_width()
     lines = []
 
     lines.append(f"{Colors.BOLD}{Colors.BRIGHT_BLUE}{'=' * width}{Colors.RESET}")
-    lines.append(center_text(f"{Colors.BOLD}{Colors.WHITE}crrcy.sh{Colors.RESET}"))
+    lines.append(
+        center_text(f"{Colors.BOLD}{Colors.WHITE}crrcy.sh{Colors.RESET}", width)
+    )
     lines.append(
         center_text(
-            f"{Colors.DIM}Real-time Currency Exchange Rates & Historical Charts{Colors.RESET}"
+            f"{Colors.DIM}Real-time Currency Exchange Rates & Historical Charts{Colors.RESET}",
+            width,
         )
     )
     lines.append(f"{Colors.BOLD}{Colors.BRIGHT_BLUE}{'=' * width}{Colors.RESET}")
@@ -196,7 +245,8 @@ def render_usage():
     lines.append(f"{Colors.BOLD}{Colors.BRIGHT_BLUE}{'=' * width}{Colors.RESET}")
     lines.append(
         center_text(
-            f"{Colors.DIM}For more info: https://github.com/marcosbtesh/crrcy.sh{Colors.RESET}"
+            f"{Colors.DIM}For more info: https://github.com/marcosbtesh/crrcy.sh{Colors.RESET}",
+            width,
         )
     )
     lines.append(f"{Colors.BOLD}{Colors.BRIGHT_BLUE}{'=' * width}{Colors.RESET}")
@@ -216,9 +266,10 @@ def _format_x_axis(date_obj, duration_delta):
 
 
 def _render_graph_footer(
-    last_updated, start_date, end_date, min_val, max_val, current_val
+    last_updated, start_date, end_date, min_val, max_val, current_val, width=None
 ):
-    width = get_terminal_width()
+    if width is None:
+        width = get_terminal_width()
 
     fmt = "%Y-%m-%d %H:%M UTC"
     start_str = (
@@ -275,230 +326,304 @@ def _render_graph_footer(
     footer_lines.append(line)
 
     min_max_line = f"{Colors.GREEN}Min: {min_val:,.2f}{Colors.RESET}  {Colors.RED}Max: {max_val:,.2f} {Colors.BRIGHT_CYAN}Current: {current_val:,.2f}{Colors.RESET}"
-    footer_lines.append(center_text(min_max_line))
+    footer_lines.append(center_text(min_max_line, width))
 
     footer_lines.append("")
-    footer_lines.append(center_text(f"{Colors.BOLD}crrcy.sh{Colors.RESET}"))
+    footer_lines.append(center_text(f"{Colors.BOLD}crrcy.sh{Colors.RESET}", width))
 
     return "\n".join(footer_lines)
 
 
-def render_graph(data: dict, start_date, end_date):
-    metadata = data.get("meta", {})
-    last_updated = metadata.get("last_updated_at", "Unknown")
-
-    series_data = data.get("data", {})
-
-    if not series_data:
-        return f"\n{Colors.RED}No data available to render graph.{Colors.RESET}\n"
+_LINE_COLORS = (
+    "",
+    Colors.BRIGHT_GREEN,
+    Colors.BRIGHT_RED,
+    Colors.BRIGHT_YELLOW,
+    Colors.DIM,
+)
 
-    latest_data_date = None
-    for target, target_data in series_data.items():
-        for date_str in target_data.keys():
-            try:
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-                if latest_data_date is None or dt > latest_data_date:
-                    latest_data_date = dt
-            except (ValueError, TypeError):
-                continue
-
-    if latest_data_date:
-        last_updated = latest_data_date.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    lines = []
-    lines.append(render_header("PRICE HISTORY", f"{start_date} - {end_date}"))
-    lines.append("")
+def _parse_series(target_data: dict, date_cache: dict) -> list:
+    points = []
 
-    for target, target_data in series_data.items():
-        points = []
+    for date_str, info in target_data.items():
+        try:
+            dt = date_cache.get(date_str)
+            if dt is None:
+                # fromisoformat is far cheaper than strptime; keep the strict
+                # YYYY-MM-DD shape the chart expects.
+                if len(date_str) != 10:
+                    raise ValueError(date_str)
+                dt = datetime.fromisoformat(date_str)
+                date_cache[date_str] = dt
+
+            val = info["value"] if isinstance(info, dict) and "value" in info else info
+            val = float(val)
+            # Aggregated history carries each bucket's low/high.
+            low = float(info.get("low", val)) if isinstance(info, dict) else val
+            high = float(info.get("high", val)) if isinstance(info, dict) else val
+            points.append((dt, val, low, high))
 
-        for date_str, info in target_data.items():
-            try:
-                val = (
-                    info["value"]
-                    if isinstance(info, dict) and "value" in info
-                    else info
-                )
+        except (ValueError, TypeError):
+            continue
 
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-                val = cast(Union[str, float, int], val)
-                points.append((dt, float(val)))
+    points.sort(key=lambda x: x[0])
+    return points
+
+
+@functools.lru_cache(maxsize=256)
+def _interpolation_plan(graph_width: int, num_points: int) -> tuple:
+    """
+    Source indices and weights for sampling num_points values at graph_width
+    columns. Depends only on the two sizes, so it is shared across requests
+    that land in the same width bucket.
+    """
+    idx = np.arange(graph_width) / graph_width * (num_points - 1)
+    idx_low = idx.astype(np.int64)
+    idx_high = np.minimum(idx_low + 1, num_points - 1)
+    frac = idx - idx_low
+    for arr in (idx_low, idx_high, frac):
+        arr.setflags(write=False)
+    return idx_low, idx_high, frac
+
+
+def _plot_line(
+    values: np.ndarray,
+    graph_width: int,
+    graph_height: int,
+    lows: np.ndarray | None = None,
+    highs: np.ndarray | None = None,
+) -> list:
+    """
+    Rasterize a series into graph_height rows of graph_width cells.
+
+    Each column interpolates the series linearly and draws a flat segment or
+    a vertical stroke towards the next column, coloured by direction. Runs of
+    same-coloured cells share one escape sequence. With lows/highs, each
+    column also gets a dim bar spanning its nearest point's range.
+    """
+    min_val = values.min() if lows is None else lows.min()
+    max_val = values.max() if highs is None else highs.max()
+    val_range = max_val - min_val if max_val != min_val else 1
+
+    idx_low, idx_high, frac = _interpolation_plan(graph_width, len(values))
+    interpolated = values[idx_low] * (1 - frac) + values[idx_high] * frac
+
+    y_positions = (max_val - interpolated) / val_range * (graph_height - 1)
+
+    rows = np.clip(np.rint(y_positions), 0, graph_height - 1).astype(np.int64)
+    row1, row2 = rows[:-1], rows[1:]
+    price_change = y_positions[1:] - y_positions[:-1]
+
+    # 1 = up (green), 2 = down (red), 3 = flat (yellow); 0 = empty cell.
+    colors = np.where(price_change < -0.1, 1, np.where(price_change > 0.1, 2, 3))
+
+    row_idx = np.arange(graph_height)[:, None]
+    drawn = np.zeros((graph_height, graph_width), dtype=bool)
+    drawn[:, :-1] = (row_idx >= np.minimum(row1, row2)) & (
+        row_idx <= np.maximum(row1, row2)
+    )
 
-            except (ValueError, TypeError):
-                continue
+    glyphs = np.where(row1 == row2, "─", "│")
+    cell_colors = np.zeros((graph_height, graph_width), dtype=np.int8)
+    cell_colors[:, :-1] = np.where(drawn[:, :-1], colors, 0)
+    cells = np.full((graph_height, graph_width), " ")
+    cells[:, :-1] = np.where(drawn[:, :-1], glyphs, " ")
 
-        points.sort(key=lambda x: x[0])
+    if lows is not None and highs is not None:
+        nearest = np.where(frac < 0.5, idx_low, idx_high)
+        top = np.rint((max_val - highs[nearest]) / val_range * (graph_height - 1))
+        bottom = np.rint((max_val - lows[nearest]) / val_range * (graph_height - 1))
+        in_range = (row_idx >= top) & (row_idx <= bottom) & ~drawn
+        cell_colors[in_range] = 4
+        cells[in_range] = "┃"
 
-        latest_target_val = points[-1][1] if points else 0
+    lines = []
+    for row in range(graph_height):
+        row_colors = cell_colors[row]
+        row_text = "".join(cells[row].tolist())
+        bounds = np.flatnonzero(np.diff(row_colors)) + 1
+        starts = [0, *bounds.tolist()]
+        ends = [*bounds.tolist(), graph_width]
+
+        parts = []
+        for start, end in zip(starts, ends):
+            color = row_colors[start]
+            if color:
+                parts.append(
+                    f"{_LINE_COLORS[color]}{row_text[start:end]}{Colors.RESET}"
+                )
+            else:
+                parts.append(row_text[start:end])
+        lines.append("".join(parts))
 
-        if not points or len(points) < 2:
-            lines.append(f"{Colors.RED}Insufficient data for {target}.{Colors.RESET}")
-            lines.append("")
-            continue
+    return lines
 
-        term_width = get_terminal_width()
-        graph_height = 12
-        y_axis_width = 12
 
-        graph_width = int((term_width - y_axis_width - 2) * 0.8)
+def _render_graph_block(
+    target, points, graph_width, graph_height, y_axis_width, duration
+) -> list:
+    block = []
 
-        values = [p[1] for p in points]
-        min_val = min(values)
-        max_val = max(values)
+    if not points or len(points) < 2:
+        block.append(f"{Colors.RED}Insufficient data for {target}.{Colors.RESET}")
+        block.append("")
+        return block
 
-        val_range = max_val - min_val if max_val != min_val else 1
+    values = np.fromiter((p[1] for p in points), dtype=np.float64)
+    lows = np.fromiter((p[2] for p in points), dtype=np.float64)
+    highs = np.fromiter((p[3] for p in points), dtype=np.float64)
+    min_val = lows.min()
+    max_val = highs.max()
+    if not (lows < highs).any():
+        lows = highs = None
 
-        lines.append(f"{Colors.BOLD}{target} Rate Chart{Colors.RESET}")
-        lines.append("")
+    val_range = max_val - min_val if max_val != min_val else 1
 
-        graph_rows = [[" " for _ in range(graph_width)] for _ in range(graph_height)]
+    block.append(f"{Colors.BOLD}{target} Rate Chart{Colors.RESET}")
+    block.append("")
 
-        y_positions = []
-        for col in range(graph_width):
-            idx = (col / graph_width) * (len(points) - 1)
-            idx_low = int(idx)
-            idx_high = min(idx_low + 1, len(points) - 1)
+    plot_rows = _plot_line(values, graph_width, graph_height, lows, highs)
+    for row, plot_row in enumerate(plot_rows):
+        row_val = max_val - (row * (val_range / (graph_height - 1)))
+        block.append(f"{Colors.WHITE}{row_val:10,.2f}{Colors.RESET} |{plot_row}")
 
-            if idx_low == idx_high:
-                val = points[idx_low][1]
-            else:
-                frac = idx - idx_low
-                val = points[idx_low][1] * (1 - frac) + points[idx_high][1] * frac
-
-            normalized_h = (max_val - val) / val_range if val_range > 0 else 0
-            row_exact = normalized_h * (graph_height - 1)
-            y_positions.append(row_exact)
-
-        for col in range(graph_width - 1):
-            x1 = col
-            y1 = y_positions[col]
-            x2 = col + 1
-            y2 = y_positions[col + 1]
-
-            row1 = int(round(y1))
-            row2 = int(round(y2))
-            row1 = max(0, min(graph_height - 1, row1))
-            row2 = max(0, min(graph_height - 1, row2))
-
-            price_change = y2 - y1
-            if price_change < -0.1:
-                color = Colors.BRIGHT_GREEN
-            elif price_change > 0.1:
-                color = Colors.BRIGHT_RED
-            else:
-                color = Colors.BRIGHT_YELLOW
-
-            if row1 == row2:
-                graph_rows[row1][col] = f"{color}─{Colors.RESET}"
-            elif row1 > row2:
-                start_row = row2
-                end_row = row1
-                for r in range(start_row, end_row + 1):
-                    if graph_rows[r][col] == " ":
-                        graph_rows[r][col] = f"{color}│{Colors.RESET}"
-            else:
-                start_row = row1
-                end_row = row2
-                for r in range(start_row, end_row + 1):
-                    if graph_rows[r][col] == " ":
-                        graph_rows[r][col] = f"{color}│{Colors.RESET}"
+    block.append(" " * y_axis_width + "+" + "-" * graph_width)
 
-        for row in range(graph_height):
-            row_val = max_val - (row * (val_range / (graph_height - 1)))
-            label = f"{Colors.WHITE}{row_val:10,.2f}{Colors.RESET} |"
+    num_labels = min(len(points), 8)
+    step = max(1, len(points) // num_labels) if len(points) >= num_labels else 1
 
-            graph_line = ""
-            for col in range(graph_width):
-                graph_line += graph_rows[row][col]
+    label_positions = []
+    for i in range(0, len(points), step):
+        dt = points[i][0]
+        label_str = _format_x_axis(dt, duration)
+        col_pos = (
+            int((i / (len(points) - 1)) * (graph_width - 1)) if len(points) > 1 else 0
+        )
+        label_positions.append((col_pos, label_str))
 
-            lines.append(label + graph_line)
+    if len(points) > 1:
+        last_col = graph_width - 1
+        last_date_str = _format_x_axis(points[-1][0], duration)
+        if label_positions[-1][0] != last_col:
+            label_positions.append((last_col, last_date_str))
 
-        lines.append(" " * y_axis_width + "+" + "-" * graph_width)
+    if len(label_positions) > 5 and len(points) > 10:
 
-        duration = (
-            end_date - start_date
-            if isinstance(end_date, datetime) and isinstance(start_date, datetime)
-            else timedelta(days=3)
-        )
+        padding_len = y_axis_width + 1
+        max_label_len = max(len(lbl) for _, lbl in label_positions)
 
-        num_labels = min(len(points), 8)
-        step = max(1, len(points) // num_labels) if len(points) >= num_labels else 1
+        for char_idx in range(max_label_len):
+            line = " " * padding_len
+            for col_pos, label_str in label_positions:
 
-        label_positions = []
-        for i in range(0, len(points), step):
-            dt = points[i][0]
-            label_str = _format_x_axis(dt, duration)
-            col_pos = (
-                int((i / (len(points) - 1)) * (graph_width - 1))
-                if len(points) > 1
-                else 0
-            )
-            label_positions.append((col_pos, label_str))
+                spaces_needed = col_pos - len(line) + padding_len
+                if spaces_needed > 0:
+                    line += " " * spaces_needed
 
-        if len(points) > 1:
-            last_col = graph_width - 1
-            last_date_str = _format_x_axis(points[-1][0], duration)
-            if label_positions[-1][0] != last_col:
-                label_positions.append((last_col, last_date_str))
+                if char_idx < len(label_str):
+                    line += label_str[char_idx]
+                else:
+                    line += " "
 
-        if len(label_positions) > 5 and len(points) > 10:
+            block.append(line)
+    else:
 
-            padding_len = y_axis_width + 1
-            max_label_len = max(len(lbl) for _, lbl in label_positions)
+        x_labels = []
+        padding_len = y_axis_width + 1
+        current_line_len = padding_len
+        x_labels.append(" " * padding_len)
 
-            for char_idx in range(max_label_len):
-                line = " " * padding_len
-                for col_pos, label_str in label_positions:
+        for col_pos, label_str in label_positions:
+            spaces_needed = col_pos - current_line_len + padding_len
 
-                    spaces_needed = col_pos - len(line) + padding_len
-                    if spaces_needed > 0:
-                        line += " " * spaces_needed
+            if spaces_needed > 0:
+                x_labels.append(" " * spaces_needed)
+                x_labels.append(f"{Colors.DIM}{label_str}{Colors.RESET}")
+                current_line_len = col_pos + len(label_str)
 
-                    if char_idx < len(label_str):
-                        line += label_str[char_idx]
-                    else:
-                        line += " "
+        block.append("".join(x_labels))
 
-                lines.append(line)
-        else:
+    block.append("")
 
-            x_labels = []
-            padding_len = y_axis_width + 1
-            current_line_len = padding_len
-            x_labels.append(" " * padding_len)
+    return block
 
-            for col_pos, label_str in label_positions:
-                spaces_needed = col_pos - current_line_len + padding_len
 
-                if spaces_needed > 0:
-                    x_labels.append(" " * spaces_needed)
-                    x_labels.append(f"{Colors.DIM}{label_str}{Colors.RESET}")
-                    current_line_len = col_pos + len(label_str)
-
-            lines.append("".join(x_labels))
+def stream_graph(
+    series_items,
+    start_date,
+    end_date,
+    width=None,
+    last_updated="Unknown",
+    targets=None,
+):
+    """
+    Yield a price-history chart piece by piece: the header, one block per
+    (target, series) pair as series_items produces them, then the footer.
+
+    The footer's summary covers every target, so it is only emitted once
+    series_items is exhausted. Its current value is that of the last of
+    targets, the requested order, whatever order the series arrive in.
+    """
+    term_width = width if width is not None else get_terminal_width()
+    graph_height = 12
+    y_axis_width = 12
+    graph_width = int((term_width - y_axis_width - 2) * 0.8)
+
+    duration = (
+        end_date - start_date
+        if isinstance(end_date, datetime) and isinstance(start_date, datetime)
+        else timedelta(days=3)
+    )
 
-        lines.append("")
+    header = render_header("PRICE HISTORY", f"{start_date} - {end_date}", term_width)
+    yield header + "\n\n"
 
+    date_cache = {}
     all_values = []
-    for target, target_data in series_data.items():
-        for date_str, info in target_data.items():
-            try:
-                if isinstance(info, dict) and "value" in info:
-                    val = info["value"]
-                else:
-                    val = info
-                if isinstance(val, (int, float)):
-                    all_values.append(float(val))
-            except (ValueError, TypeError):
-                continue
+    current_target = targets[-1] if targets else None
+    latest_target_val = 0
+    for target, target_data in series_items:
+        points = _parse_series(target_data, date_cache)
+        if current_target is None or target == current_target:
+            latest_target_val = points[-1][1] if points else 0
+        all_values.extend(v for _, _, low, high in points for v in (low, high))
+
+        block = _render_graph_block(
+            target, points, graph_width, graph_height, y_axis_width, duration
+        )
+        yield "\n".join(block) + "\n"
+
+    if date_cache:
+        latest_data_date = max(date_cache.values())
+        last_updated = latest_data_date.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     min_all = min(all_values) if all_values else 0
     max_all = max(all_values) if all_values else 0
     current_val = latest_target_val
 
     footer_lines = _render_graph_footer(
-        last_updated, start_date, end_date, min_all, max_all, current_val
+        last_updated, start_date, end_date, min_all, max_all, current_val, term_width
     )
-    lines.append(footer_lines)
+    yield footer_lines + "\n"
 
-    return "\n".join(lines) + "\n"
+
+def render_graph(data: dict, start_date, end_date, width=None):
+    metadata = data.get("meta", {})
+    last_updated = metadata.get("last_updated_at", "Unknown")
+
+    series_data = data.get("data", {})
+
+    if not series_data:
+        return f"\n{Colors.RED}No data available to render graph.{Colors.RESET}\n"
+
+    return "".join(
+        stream_graph(
+            series_data.items(),
+            start_date,
+            end_date,
+            width,
+            last_updated,
+            targets=list(series_data),
+        )
+    )
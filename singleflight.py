@@ -0,0 +1,91 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+import redis
+
+from cache import backend
+
+LOCK_PREFIX = "lock"
+
+# Flask runs each async view in its own event loop (and gunicorn threads may
+# run several at once), so in-flight calls are tracked with thread-safe
+# concurrent futures that any loop can await.
+_inflight: dict[str, concurrent.futures.Future] = {}
+_inflight_lock = threading.Lock()
+
+
+async def single_flight(
+    key: str,
+    fetch: Callable[[], Awaitable[Any]],
+    recheck: Optional[Callable[[], Awaitable[Any]]] = None,
+    lock_timeout: float = 10.0,
+    poll_interval: float = 0.05,
+) -> Any:
+    """
+    Run fetch() at most once at a time per key.
+
+    Callers in this process that arrive while a fetch is running share its
+    result. Across workers a short lock in the cache backend elects a single
+    fetcher; the others wait for the lock to clear and then call recheck()
+    (typically a cache read), falling back to fetch() if it returns None.
+    fetch() must populate the cache before returning for that hand-off to
+    work.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = concurrent.futures.Future()
+            _inflight[key] = future
+
+    if not is_leader:
+        return await asyncio.wrap_future(future)
+
+    try:
+        result = await _fetch_with_lock(
+            key, fetch, recheck, lock_timeout, poll_interval
+        )
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+async def _fetch_with_lock(key, fetch, recheck, lock_timeout, poll_interval):
+    lock_name = f"{LOCK_PREFIX}:{key}"
+
+    try:
+        token = await backend.acquire_lock_async(lock_name, lock_timeout)
+    except redis.RedisError:
+        return await fetch()
+
+    if token is not None:
+        try:
+            return await fetch()
+        finally:
+            try:
+                await backend.release_lock_async(lock_name, token)
+            except redis.RedisError:
+                pass
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lock_timeout
+    try:
+        while loop.time() < deadline and await backend.exists_async(lock_name):
+            await asyncio.sleep(poll_interval)
+    except redis.RedisError:
+        pass
+
+    if recheck is not None:
+        result = await recheck()
+        if result is not None:
+            return result
+
+    return await fetch()
@@ -0,0 +1,124 @@
+import asyncio
+import weakref
+
+import everapi.exceptions
+import httpx
+
+from metrics import (
+    UPSTREAM_QUOTA_LIMIT,
+    UPSTREAM_QUOTA_REMAINING,
+    UPSTREAM_REQUESTS,
+    stage_timer,
+)
+
+API_BASE = "https://api.currencyapi.com/v3"
+
+
+class AsyncCurrencyClient:
+    """
+    asyncio counterpart of currencyapicom.Client.
+
+    Exposes the same latest/historical calls, but over a pooled keep-alive
+    httpx.AsyncClient with a cap on in-flight requests. httpx clients and
+    asyncio semaphores are bound to the event loop that created them, so
+    both are kept per loop; the server runs all request I/O on one
+    long-lived loop per worker (main.on_io_loop), which gives one pool and
+    one cap per process.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None,
+        base: str = API_BASE,
+        max_concurrency: int = 8,
+        timeout: float = 10.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.api_key = api_key
+        self.api_base = base
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # Lets benchmarks point the client at a fake currencyapi.
+        self.transport = transport
+        self._loop_state: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _state(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            headers = {"Accept": "application/json"}
+            if self.api_key:
+                headers["apikey"] = self.api_key
+            http = httpx.AsyncClient(
+                base_url=self.api_base,
+                headers=headers,
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            state = (http, asyncio.Semaphore(self.max_concurrency))
+            self._loop_state[loop] = state
+        return state
+
+    async def _request(self, path: str, params: dict) -> dict:
+        http, semaphore = self._state()
+        params = {k: v for k, v in params.items() if v}
+
+        endpoint = path.strip("/")
+        async with semaphore:
+            with stage_timer(f"upstream_{endpoint}"):
+                response = await http.get(path, params=params)
+
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        quota = response.headers.get("x-ratelimit-remaining-quota-month")
+        quota_limit = response.headers.get("x-ratelimit-limit-quota-month")
+        if quota is not None:
+            UPSTREAM_QUOTA_REMAINING.set(int(quota))
+        if quota_limit is not None:
+            UPSTREAM_QUOTA_LIMIT.set(int(quota_limit))
+
+        if response.status_code == 429:
+            if quota is not None and int(quota) <= 0:
+                raise everapi.exceptions.QuotaExceeded()
+            raise everapi.exceptions.RateLimitExceeded()
+        elif response.status_code == 403:
+            raise everapi.exceptions.NotAllowed()
+        elif response.status_code == 401:
+            raise everapi.exceptions.IncorrectApikey()
+
+        response_obj = response.json()
+        if "errors" in response_obj:
+            raise everapi.exceptions.ApiError(
+                "API returned errors:", response_obj["errors"]
+            )
+        return response_obj
+
+    async def latest(self, base_currency=None, currencies: list | None = None):
+        return await self._request(
+            "/latest",
+            {
+                "base_currency": base_currency,
+                "currencies": ",".join(currencies or []),
+            },
+        )
+
+    async def historical(
+        self, date, base_currency=None, currencies: list | None = None
+    ):
+        return await self._request(
+            "/historical",
+            {
+                "date": date,
+                "base_currency": base_currency,
+                "currencies": ",".join(currencies or []),
+            },
+        )
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.pop(loop, None)
+        if state is not None:
+            await state[0].aclose()